@@ -0,0 +1,44 @@
+import timeit
+
+from mocogpt import contains, startswith
+from mocogpt.core.chat_completions import Completions, CompletionsRequest
+
+SESSIONS = 1000
+NUMBER = 20
+
+
+def create_sessions():
+    completions = Completions()
+    for index in range(SESSIONS):
+        completions.request(prompt=startswith(f"Prompt {index}:"), model="gpt-4")
+        completions.request(prompt=contains(f"#{index}#"), temperature=0.5)
+
+    return completions.sessions
+
+
+def scan(matchers, request):
+    return next((matcher for matcher in matchers if matcher(request)), None)
+
+
+def main():
+    sessions = create_sessions()
+    request = CompletionsRequest({'Authorization': 'Bearer sk-123456789'}, {
+        'model': 'gpt-4',
+        'messages': [{'role': 'user', 'content': 'No session matches this prompt'}],
+        'temperature': 1.0
+    })
+
+    interpreted = [session._matcher.match for session in sessions]
+    compiled = [session._matcher.compile() for session in sessions]
+
+    interpreted_time = min(timeit.repeat(lambda: scan(interpreted, request), number=NUMBER, repeat=5)) / NUMBER
+    compiled_time = min(timeit.repeat(lambda: scan(compiled, request), number=NUMBER, repeat=5)) / NUMBER
+
+    print(f"sessions:    {len(sessions)}")
+    print(f"interpreted: {interpreted_time * 1e6:.1f} us/request")
+    print(f"compiled:    {compiled_time * 1e6:.1f} us/request")
+    print(f"speedup:     {interpreted_time / compiled_time:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
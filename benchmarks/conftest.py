@@ -0,0 +1,87 @@
+import json
+import platform
+import statistics
+import sys
+import time
+import timeit
+from datetime import UTC, datetime
+
+import pytest
+
+DEFAULT_OUTPUT = "benchmark-results.json"
+REPEAT = 5
+
+
+def pytest_addoption(parser):
+    parser.addoption("--benchmark-output", default=DEFAULT_OUTPUT,
+                     help="File the benchmark results are written to as JSON.")
+
+
+class Benchmark:
+    """Times a callable like ``timeit``: calibrates the number of calls, then keeps every repetition.
+
+    A callable which runs a batch of operations sets ``operations``, so timings are per operation.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.operations = 1
+        self.result = None
+
+    def __call__(self, func, *args, **kwargs):
+        timer = timeit.Timer(lambda: func(*args, **kwargs), timer=time.perf_counter)
+        number, _ = timer.autorange()
+        timings = [elapsed / number / self.operations for elapsed in timer.repeat(repeat=REPEAT, number=number)]
+
+        self.result = {
+            'name': self.name,
+            'number': number,
+            'operations': self.operations,
+            'repeat': REPEAT,
+            'min': min(timings),
+            'median': statistics.median(timings),
+            'max': max(timings),
+            'stddev': statistics.stdev(timings),
+        }
+        return func(*args, **kwargs)
+
+
+def pytest_configure(config):
+    config._benchmarks = []
+
+
+@pytest.fixture
+def benchmark(request):
+    bench = Benchmark(request.node.nodeid)
+    yield bench
+
+    if bench.result is not None:
+        request.config._benchmarks.append(bench.result)
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    if not config._benchmarks:
+        return
+
+    terminalreporter.section("benchmarks")
+    for result in config._benchmarks:
+        terminalreporter.write_line(f"{result['min'] * 1e6:12.2f} us  {result['name']}")
+
+
+def pytest_sessionfinish(session):
+    config = session.config
+    if not config._benchmarks:
+        return
+
+    with open(config.getoption("benchmark_output"), "w") as f:
+        json.dump({
+            'datetime': datetime.now(UTC).isoformat(),
+            'machine': {
+                'python': sys.version.split()[0],
+                'implementation': platform.python_implementation(),
+                'platform': platform.platform(),
+                'processor': platform.processor(),
+            },
+            'unit': 'seconds',
+            'benchmarks': config._benchmarks,
+        }, f, indent=2)
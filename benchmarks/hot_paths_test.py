@@ -0,0 +1,239 @@
+"""Microbenchmarks of the request hot paths.
+
+Run with ``python -m pytest benchmarks``, results are written to ``benchmark-results.json``
+or to the file given with ``--benchmark-output``.
+"""
+import asyncio
+import json
+import random
+from array import array
+
+import pytest
+from aiohttp.http_writer import StreamWriter
+from aiohttp.test_utils import make_mocked_request
+
+from mocogpt import contains, fixture, ngrams, synthetic
+from mocogpt.core._dispatch import SessionDispatcher
+from mocogpt.core._journal import RequestJournal
+from mocogpt.core._sse import EventSourceResponse
+from mocogpt.core._timing import RequestTiming
+from mocogpt.core.actual_server import EMBEDDINGS, ActualGptServer, SessionSettingMixin, extend_instance
+from mocogpt.core.chat_completions import (
+    Completions,
+    CompletionsRequest,
+    CompletionsResponse,
+    count_tokens,
+    split_content,
+)
+from mocogpt.core.embeddings import Embeddings, EmbeddingsRequest, EmbeddingsResponse
+
+MODEL = "gpt-4"
+CONTENT = ("Paris is the capital and most populous city of France. With an estimated population of "
+           "2,102,650 residents, it is the centre of the Ile-de-France region. ") * 4
+SESSIONS = [10, 100, 1000]
+DIMENSIONS = [1536, 3072]
+EVENTS = 100
+BATCH = 2048
+
+
+@pytest.fixture(scope="module")
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def create_request(prompt):
+    return CompletionsRequest({'Authorization': 'Bearer sk-123456789'}, {
+        'model': MODEL,
+        'messages': [{'role': 'user', 'content': prompt}],
+        'temperature': 1.0
+    })
+
+
+def create_response():
+    response = CompletionsResponse(MODEL, 10)
+    response.content = CONTENT
+    return response
+
+
+def create_sessions(count):
+    completions = Completions()
+    for index in range(count):
+        completions.request(prompt=f"Prompt {index}", model=MODEL).response(content=CONTENT)
+
+    return completions.sessions
+
+
+def test_create_matchers(benchmark):
+    completions = Completions()
+    matcher = benchmark(completions._actual_create_matchers, prompt=contains("Hi"), model=MODEL, temperature=0.5)
+    assert matcher is not None
+
+
+@pytest.mark.parametrize("count", SESSIONS)
+def test_match_sessions(benchmark, count):
+    matchers = [session._matcher for session in create_sessions(count)]
+    request = create_request("No session matches this prompt")
+
+    assert benchmark(lambda: next((matcher for matcher in matchers if matcher.match(request)), None)) is None
+
+
+@pytest.mark.parametrize("count", SESSIONS)
+def test_dispatch_sessions(benchmark, count):
+    sessions = create_sessions(count)
+    for session in sessions:
+        session.match = session._matcher.compile()
+    dispatcher = SessionDispatcher(sessions)
+    request = create_request(f"Prompt {count - 1}")
+
+    assert benchmark(dispatcher.dispatch, request) is sessions[-1]
+
+
+@pytest.mark.parametrize("count", SESSIONS)
+def test_dispatch_embeddings_batch(benchmark, count):
+    embeddings = Embeddings()
+    for index in range(count):
+        embeddings.request(input=f"Document {index}").response(embeddings=[0.1, 0.2])
+    sessions = [extend_instance(session, SessionSettingMixin).prepare(position)
+                for position, session in enumerate(embeddings.sessions)]
+    dispatcher = SessionDispatcher(sessions)
+    request = EmbeddingsRequest({'Authorization': 'Bearer sk-123456789'}, {
+        'model': 'text-embedding-ada-002',
+        'input': [f"Document {index % count}" for index in range(BATCH)]
+    })
+    timing = RequestTiming(EMBEDDINGS)
+
+    benchmark.operations = BATCH
+    batch = benchmark(ActualGptServer._dispatch_batch, dispatcher, RequestJournal(0), request, timing)
+    assert len(batch.sessions) == BATCH
+
+
+def test_count_tokens(benchmark):
+    assert benchmark(count_tokens, MODEL, CONTENT) > 0
+
+
+def test_split_content(benchmark):
+    assert "".join(benchmark(split_content, MODEL, CONTENT)) == CONTENT
+
+
+def test_to_dict(benchmark):
+    response = create_response()
+    assert benchmark(response.to_dict)['choices'][0]['message']['content'] == CONTENT
+
+
+def test_to_json(benchmark):
+    response = create_response()
+    templates = {}
+    assert json.loads(benchmark(response.to_json, templates))['choices'][0]['message']['content'] == CONTENT
+
+
+def test_sse_content(benchmark, loop):
+    response = create_response()
+
+    async def consume():
+        return [chunk async for chunk in response.sse_content()]
+
+    chunks = benchmark(lambda: loop.run_until_complete(consume()))
+    assert "".join(chunk['choices'][0]['delta']['content'] for chunk in chunks) == CONTENT
+
+
+def test_sse_frames(benchmark):
+    response = create_response()
+    templates = {}
+    assert len(benchmark(lambda: list(response.sse_frames(templates)))) == len(split_content(MODEL, CONTENT))
+
+
+class NullTransport(asyncio.Transport):
+    def write(self, data):
+        pass
+
+    def is_closing(self):
+        return False
+
+
+class NullProtocol:
+    transport = NullTransport()
+    _paused = False
+
+    async def _drain_helper(self):
+        pass
+
+
+def test_event_source_send(benchmark, loop):
+    writer = StreamWriter(NullProtocol(), loop)
+    data = json.dumps(create_response()._chunk("chatcmpl-1", 0, "Paris", None))
+
+    async def prepare():
+        response = EventSourceResponse()
+        await response.prepare(make_mocked_request('POST', '/v1/chat/completions', writer=writer, loop=loop))
+        return response
+
+    async def send(response):
+        for _ in range(EVENTS):
+            await response.send(data)
+
+    response = loop.run_until_complete(prepare())
+    benchmark.operations = EVENTS
+    benchmark(lambda: loop.run_until_complete(send(response)))
+    response.stop_streaming()
+    loop.run_until_complete(response.wait())
+
+
+@pytest.mark.parametrize("dimensions", DIMENSIONS)
+def test_to_embeddings(benchmark, dimensions):
+    response = EmbeddingsResponse("text-embedding-ada-002")
+    response.embedding = [random.uniform(-1, 1) for _ in range(dimensions)]
+
+    assert len(benchmark(response.to_embeddings)['data'][0]['embedding']) == dimensions
+
+
+@pytest.mark.parametrize("dimensions", DIMENSIONS)
+def test_synthetic_embedding(benchmark, dimensions):
+    generator = synthetic(dimensions=dimensions, cache_size=0)
+    request = EmbeddingsRequest({}, {'model': 'text-embedding-3-small', 'input': CONTENT})
+
+    assert len(benchmark(generator.generate, request)) == dimensions
+
+
+@pytest.mark.parametrize("dimensions", DIMENSIONS)
+def test_ngram_embedding(benchmark, dimensions):
+    generator = ngrams(dimensions=dimensions, cache_size=0)
+    request = EmbeddingsRequest({}, {'model': 'text-embedding-3-small', 'input': CONTENT})
+
+    assert len(benchmark(generator.generate, request)) == dimensions
+
+
+@pytest.mark.parametrize("dimensions", DIMENSIONS)
+def test_fixture_embedding(benchmark, dimensions, tmp_path):
+    vectors = tmp_path / "vectors.f32"
+    vectors.write_bytes(array('f', [random.uniform(-1, 1) for _ in range(dimensions)]).tobytes() * 1000)
+    generator = fixture(str(vectors), {f"Document {row}": row for row in range(1000)}, dimensions, cache_size=0)
+    request = EmbeddingsRequest({}, {'model': 'text-embedding-3-small', 'input': "Document 999"})
+
+    assert len(benchmark(generator.generate, request)) == dimensions
+
+
+@pytest.mark.parametrize("dimensions", DIMENSIONS)
+def test_serialize_embeddings(benchmark, dimensions):
+    response = EmbeddingsResponse("text-embedding-ada-002")
+    response.embedding = [random.uniform(-1, 1) for _ in range(dimensions)]
+
+    assert benchmark(lambda: json.dumps(response.to_embeddings()))
+
+
+@pytest.mark.parametrize("encoding_format", ["float", "base64"])
+@pytest.mark.parametrize("dimensions", DIMENSIONS)
+def test_embeddings_to_json(benchmark, dimensions, encoding_format):
+    response = EmbeddingsResponse("text-embedding-ada-002")
+    response.embedding = [random.uniform(-1, 1) for _ in range(dimensions)]
+
+    assert json.loads(benchmark(response.to_json, encoding_format))['data'][0]['index'] == 0
+
+
+@pytest.mark.parametrize("dimensions", DIMENSIONS)
+def test_serialize_base64_embeddings(benchmark, dimensions):
+    response = EmbeddingsResponse("text-embedding-ada-002")
+    response.embedding = [random.uniform(-1, 1) for _ in range(dimensions)]
+
+    assert benchmark(lambda: json.dumps(response.to_embeddings('base64')))
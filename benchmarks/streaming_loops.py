@@ -0,0 +1,89 @@
+import asyncio
+import multiprocessing
+import os
+import time
+
+import aiohttp
+
+from mocogpt import gpt_server
+from mocogpt.core._loop import loop_factory
+
+PORT = 12399
+CONTENT = "The quick brown fox jumps over the lazy dog. " * 20
+
+# name, tokens per second of every stream, concurrent streams, total streams
+SCENARIOS = [
+    ('unthrottled', None, 64, 1000),
+    ('throttled', 1000, 256, 512),
+]
+
+
+def serve(loop, tokens_per_second):
+    server = gpt_server(PORT, loop=loop)
+    server.chat.completions.request(prompt="Hi").response(content=CONTENT, tokens_per_second=tokens_per_second)
+    server.start_server()
+
+
+async def stream(session: aiohttp.ClientSession):
+    async with session.post(f"http://localhost:{PORT}/v1/chat/completions", json={
+        'model': 'gpt-4',
+        'messages': [{'role': 'user', 'content': 'Hi'}],
+        'stream': True
+    }) as response:
+        lines = 0
+        async for _ in response.content:
+            lines += 1
+        return lines // 2
+
+
+async def drive(concurrency, requests):
+    remaining = iter(range(requests))
+    total = 0
+
+    async def worker(session):
+        nonlocal total
+        for _ in remaining:
+            chunks = await stream(session)
+            total += chunks
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await stream(session)
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        return time.perf_counter() - start, total
+
+
+def cpu_seconds(pid):
+    # utime and stime of /proc/<pid>/stat, the client shares the machine so wall time alone misleads.
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def run(loop, name, tokens_per_second, concurrency, requests):
+    process = multiprocessing.get_context('fork').Process(target=serve, args=(loop, tokens_per_second))
+    process.start()
+    try:
+        time.sleep(1)
+        cpu = cpu_seconds(process.pid)
+        # The client always runs on the fastest loop available, so the server is what is measured.
+        with asyncio.Runner(loop_factory=loop_factory('uvloop')) as runner:
+            elapsed, chunks = runner.run(drive(concurrency, requests))
+        cpu = cpu_seconds(process.pid) - cpu
+    finally:
+        process.terminate()
+        process.join()
+
+    print(f"{name:12} {loop:8} {requests / elapsed:8.1f} streams/s {chunks / elapsed:10.1f} chunks/s "
+          f"{cpu / chunks * 1e6:6.2f} us server cpu/chunk")
+
+
+def main():
+    for scenario in SCENARIOS:
+        for loop in ('asyncio', 'uvloop'):
+            run(loop, *scenario)
+
+
+if __name__ == '__main__':
+    main()
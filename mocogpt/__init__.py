@@ -1,4 +1,6 @@
-from .core.actual_server import ActualGptServer
+from .core._journal import DEFAULT_JOURNAL_CAPACITY
+from .core._trace import TraceMonitor
+from .core.actual_server import ActualGptServer, Monitor
 from .core.base_server import GptServer
 from .core.base_typing import (
     any_of,
@@ -11,14 +13,18 @@ from .core.base_typing import (
     eq,
     internal_error,
     none_of,
+    normal,
     not_found,
+    percentiles,
     permission_denied,
     rate_limit,
     redirect,
     regex,
     startswith,
+    uniform,
     unprocessable_entity,
 )
+from .core.embeddings import fixture, ngrams, synthetic
 
 __all__ = [
     'eq',
@@ -39,8 +45,19 @@ __all__ = [
     'internal_error',
     'unprocessable_entity',
     'redirect',
+    'uniform',
+    'normal',
+    'percentiles',
+    'synthetic',
+    'ngrams',
+    'fixture',
 ]
 
 
-def gpt_server(port) -> GptServer:
-    return ActualGptServer(port)
+def gpt_server(port, combine_regex=False, tokens_per_second=None, loop=None, expose_metrics=False,
+               metrics_file=None, trace_file=None, journal_capacity=DEFAULT_JOURNAL_CAPACITY,
+               journal_eviction='oldest') -> GptServer:
+    monitor = TraceMonitor(trace_file) if trace_file is not None else Monitor()
+    return ActualGptServer(port, monitor=monitor, combine_regex=combine_regex, tokens_per_second=tokens_per_second,
+                           loop=loop, expose_metrics=expose_metrics, metrics_file=metrics_file,
+                           journal_capacity=journal_capacity, journal_eviction=journal_eviction)
@@ -1,7 +1,16 @@
 class StartArgs:
-    def __init__(self, port, settings):
+    def __init__(self, port, settings, host='0.0.0.0', backlog=128, reuse_port=None, loop=None,
+                 expose_metrics=False, metrics_file=None, log_options=None, trace_file=None):
         self._port = port
         self._settings = settings
+        self._host = host
+        self._backlog = backlog
+        self._reuse_port = reuse_port
+        self._loop = loop
+        self._expose_metrics = expose_metrics
+        self._metrics_file = metrics_file
+        self._log_options = log_options or {}
+        self._trace_file = trace_file
 
     @property
     def port(self):
@@ -11,4 +20,34 @@ class StartArgs:
     def settings(self):
         return self._settings
 
+    @property
+    def host(self):
+        return self._host
+
+    @property
+    def backlog(self):
+        return self._backlog
+
+    @property
+    def reuse_port(self):
+        return self._reuse_port
+
+    @property
+    def loop(self):
+        return self._loop
 
+    @property
+    def expose_metrics(self):
+        return self._expose_metrics
+
+    @property
+    def metrics_file(self):
+        return self._metrics_file
+
+    @property
+    def log_options(self):
+        return self._log_options
+
+    @property
+    def trace_file(self):
+        return self._trace_file
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import math
+import time
+from collections import Counter
+
+import aiohttp
+
+from mocogpt.core._loop import loop_factory
+from mocogpt.core.actual_server import ActualGptServer
+
+from ._parser import ConfigParser
+
+ENDPOINTS = {
+    'chat': '/chat/completions',
+    'embeddings': '/embeddings',
+}
+
+DEFAULT_MODELS = {
+    'chat': 'gpt-4',
+    'embeddings': 'text-embedding-ada-002',
+}
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return math.nan
+
+    return values[max(math.ceil(len(values) * p / 100) - 1, 0)]
+
+
+def request_body(endpoint, model=None, prompt="Hi", stream=False, data=None):
+    if data is not None:
+        body = json.loads(data)
+    elif endpoint == 'embeddings':
+        body = {'model': model or DEFAULT_MODELS[endpoint], 'input': prompt}
+    else:
+        body = {'model': model or DEFAULT_MODELS[endpoint], 'messages': [{'role': 'user', 'content': prompt}]}
+
+    if endpoint == 'chat':
+        body['stream'] = stream
+
+    return body
+
+
+class BenchResult:
+    def __init__(self):
+        self.latencies = []
+        self.first_chunks = []
+        self.errors = Counter()
+        self.elapsed = 0.0
+
+    @property
+    def requests(self):
+        return len(self.latencies) + sum(self.errors.values())
+
+    def report(self) -> str:
+        latencies = sorted(self.latencies)
+        rows = [
+            ("Requests", f"{self.requests} ({sum(self.errors.values())} errors)"),
+            ("Duration", f"{self.elapsed:.2f} s"),
+            ("RPS", f"{self.requests / self.elapsed if self.elapsed else 0:.1f}"),
+            ("Latency", _distribution(latencies)),
+        ]
+
+        if self.first_chunks:
+            rows.append(("First chunk", _distribution(sorted(self.first_chunks))))
+
+        if self.errors:
+            rows.append(("Errors", ", ".join(f"{error}: {count}" for error, count in self.errors.most_common())))
+
+        return "\n".join(f"{name + ':':<13}{value}" for name, value in rows)
+
+
+def _distribution(values: list[float]) -> str:
+    if not values:
+        return "n/a"
+
+    stats = [(f"p{p}", percentile(values, p)) for p in (50, 90, 99)] + [('max', values[-1])]
+    return "  ".join(f"{name} {value * 1000:.2f} ms" for name, value in stats)
+
+
+class LoadGenerator:
+    """Sends requests from a number of concurrent clients sharing a pool of connections."""
+
+    def __init__(self, url, body, headers=None, requests=1000, concurrency=64, connections=None, timeout=30.0):
+        self.url = url
+        self.body = json.dumps(body).encode()
+        self.stream = body.get('stream', False)
+        self.headers = {'Content-Type': 'application/json', **(headers or {})}
+        self.requests = requests
+        self.concurrency = concurrency
+        self.connections = connections or concurrency
+        self.timeout = timeout
+
+    async def run(self) -> BenchResult:
+        result = BenchResult()
+        remaining = iter(range(self.requests))
+        connector = aiohttp.TCPConnector(limit=self.connections)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=self.headers) as session:
+            async def client():
+                for _ in remaining:
+                    await self._send(session, result)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(client() for _ in range(min(self.concurrency, self.requests))))
+            result.elapsed = time.perf_counter() - start
+
+        return result
+
+    async def _send(self, session: aiohttp.ClientSession, result: BenchResult):
+        start = time.perf_counter()
+        try:
+            async with session.post(self.url, data=self.body) as response:
+                if self.stream:
+                    first_chunk = None
+                    async for _ in response.content.iter_any():
+                        if first_chunk is None:
+                            first_chunk = time.perf_counter() - start
+                else:
+                    await response.read()
+        except (TimeoutError, aiohttp.ClientError) as e:
+            result.errors[type(e).__name__] += 1
+            return
+
+        if response.status >= 400:
+            result.errors[str(response.status)] += 1
+            return
+
+        result.latencies.append(time.perf_counter() - start)
+        if self.stream and first_chunk is not None:
+            result.first_chunks.append(first_chunk)
+
+
+def bench(generator: LoadGenerator, loop=None) -> BenchResult:
+    with asyncio.Runner(loop_factory=loop_factory(loop)) as runner:
+        return runner.run(generator.run())
+
+
+def in_process_server(config, port, loop=None) -> ActualGptServer:
+    """Creates a quiet server from a config, to be run in a background thread with ``with``."""
+    with open(config) as f:
+        settings = json.load(f)
+
+    server = ActualGptServer(port, tokens_per_second=settings.get('tokens_per_second'), loop=loop)
+    ConfigParser().bind(settings, server)
+    return server
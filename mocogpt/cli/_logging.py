@@ -0,0 +1,127 @@
+import json
+import queue
+import threading
+from datetime import UTC, datetime
+from typing import NamedTuple
+
+from loguru import logger
+
+DEFAULT_QUEUE_SIZE = 65536
+FILE_BUFFER_SIZE = 1 << 16
+
+_CLOSE = object()
+
+
+class LogRecord(NamedTuple):
+    time: float
+    level: str
+    event: str
+    payload: object
+
+
+def as_text(payload) -> str:
+    if isinstance(payload, str):
+        return payload
+
+    if isinstance(payload, bytes):
+        return payload.decode('utf-8', 'replace').rstrip()
+
+    return str(payload)
+
+
+def truncate(text: str, limit: int | None) -> str:
+    if limit is None or len(text) <= limit:
+        return text
+
+    return f"{text[:limit]}... ({len(text) - limit} more characters)"
+
+
+class LogWriter:
+    """Formats and writes log records on a background thread, so the event loop only enqueues them.
+
+    Records are written to the console through loguru, or to ``log_file`` as NDJSON. When the writer
+    falls behind and its queue is full, records are dropped and counted instead of blocking the loop.
+    """
+
+    def __init__(self, log_file=None, max_payload=None, queue_size=DEFAULT_QUEUE_SIZE):
+        self.log_file = log_file
+        self.max_payload = max_payload
+        self.dropped = 0
+        self._queue = queue.Queue(queue_size)
+        self._thread = None
+        self._file = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+
+        if self.log_file is not None:
+            self._file = open(self.log_file, 'a', buffering=FILE_BUFFER_SIZE, encoding='utf-8')
+
+        self._thread = threading.Thread(target=self._run, name="mocogpt-log-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, record: LogRecord):
+        if self._thread is None:
+            return
+
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        if self._thread is None:
+            return
+
+        thread, self._thread = self._thread, None
+        self._queue.put(_CLOSE)
+        thread.join()
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        if self.dropped:
+            logger.warning(f"Dropped {self.dropped} log records")
+
+    def _run(self):
+        write = self._write_file if self._file is not None else self._write_console
+        while True:
+            record = self._queue.get()
+            if record is _CLOSE:
+                return
+
+            try:
+                write(record)
+            except Exception as e:
+                logger.error(f"Failed to write log record: {e}")
+
+            if self._file is not None and self._queue.empty():
+                self._file.flush()
+
+    def _write_console(self, record: LogRecord):
+        message = f"{record.event.capitalize()}: {truncate(as_text(record.payload), self.max_payload)}"
+
+        def at_record_time(entry):
+            entry['time'] = entry['time'].fromtimestamp(record.time, entry['time'].tzinfo)
+
+        logger.patch(at_record_time).log(record.level, message)
+
+    def _write_file(self, record: LogRecord):
+        payload = record.payload
+        if isinstance(payload, bytes):
+            payload = as_text(payload)
+
+        if self.max_payload is not None:
+            text = payload if isinstance(payload, str) else json.dumps(payload, default=str)
+            if len(text) > self.max_payload:
+                payload = truncate(text, self.max_payload)
+
+        self._file.write(json.dumps({
+            'time': datetime.fromtimestamp(record.time, UTC).isoformat(),
+            'level': record.level,
+            'event': record.event,
+            'payload': payload,
+        }, default=str))
+        self._file.write('\n')
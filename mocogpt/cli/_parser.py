@@ -15,6 +15,42 @@ def create_error(error):
     raise f"Unknown API Error: {name}"
 
 
+LATENCY_DISTRIBUTIONS = {
+    'uniform': mocogpt.uniform,
+    'normal': mocogpt.normal,
+    'percentiles': mocogpt.percentiles,
+}
+
+
+def create_latency(latency):
+    if not isinstance(latency, dict):
+        return latency
+
+    name = latency.get('distribution')
+    if name not in LATENCY_DISTRIBUTIONS:
+        raise ValueError(f"Unknown latency distribution: {name}")
+
+    return LATENCY_DISTRIBUTIONS[name](**{k: v for k, v in latency.items() if k != 'distribution'})
+
+
+EMBEDDING_GENERATORS = {
+    'synthetic': mocogpt.synthetic,
+    'ngrams': mocogpt.ngrams,
+    'fixture': mocogpt.fixture,
+}
+
+
+def create_embeddings(embeddings):
+    if not isinstance(embeddings, dict):
+        return embeddings
+
+    name = embeddings.get('generator')
+    if name not in EMBEDDING_GENERATORS:
+        raise ValueError(f"Unknown embedding generator: {name}")
+
+    return EMBEDDING_GENERATORS[name](**{k: v for k, v in embeddings.items() if k != 'generator'})
+
+
 def create_direct(redirect):
     status = redirect['status']
     location = redirect['location']
@@ -31,7 +67,7 @@ def create_common_matcher(request: dict, matcher: dict):
 
 def create_common_handler(response: dict, handler: dict):
     if "sleep" in response:
-        handler["sleep"] = response['sleep']
+        handler["sleep"] = create_latency(response['sleep'])
     if "error" in response:
         handler["error"] = create_error(response["error"])
     if "redirect" in response:
@@ -69,6 +105,12 @@ class ChatCompletionsBinder:
         handler = {}
         if "content" in response:
             handler["content"] = response['content']
+        if "first_token_delay" in response:
+            handler["first_token_delay"] = create_latency(response['first_token_delay'])
+        if "inter_token_delay" in response:
+            handler["inter_token_delay"] = create_latency(response['inter_token_delay'])
+        if "tokens_per_second" in response:
+            handler["tokens_per_second"] = response['tokens_per_second']
 
         create_common_handler(response, handler)
 
@@ -100,7 +142,7 @@ class EmbeddingsBinder:
     def create_handler(self, response):
         handler = {}
         if "embeddings" in response:
-            handler["embeddings"] = response["embeddings"]
+            handler["embeddings"] = create_embeddings(response["embeddings"])
 
         create_common_handler(response, handler)
 
@@ -109,7 +151,11 @@ class EmbeddingsBinder:
 
 class ConfigParser:
     def parse(self, cliargs: StartArgs):
-        server = console_server(cliargs.port)
+        server = console_server(cliargs.port, tokens_per_second=cliargs.settings.get('tokens_per_second'),
+                                host=cliargs.host, backlog=cliargs.backlog, reuse_port=cliargs.reuse_port,
+                                loop=cliargs.loop, expose_metrics=cliargs.expose_metrics,
+                                metrics_file=cliargs.metrics_file, log_options=cliargs.log_options,
+                                trace_file=cliargs.trace_file)
         self.bind(cliargs.settings, server)
         return server
 
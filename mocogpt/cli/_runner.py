@@ -1,24 +1,126 @@
 import json
+import multiprocessing
 import signal
+import sys
 import time
+from multiprocessing.connection import wait
+
+from loguru import logger
 
 from ._args import StartArgs
 from ._parser import ConfigParser
 
+# A worker which dies sooner than this after starting is failing to boot, restarting it would only spin.
+MIN_WORKER_UPTIME = 1.0
+WORKER_STOP_TIMEOUT = 5.0
+
 
 class CliRunner:
     @staticmethod
-    def run(config, port):
+    def run(config, port, workers=1, **options):
+        if workers > 1:
+            WorkerSupervisor(config, port, workers, **options).run()
+        else:
+            CliRunner.serve(config, port, **options)
+
+    @staticmethod
+    def serve(config, port, **options):
         with open(config) as f:
             settings = json.load(f)
-            args = StartArgs(port, settings)
+            args = StartArgs(port, settings, **options)
             server = ConfigParser().parse(args)
 
             stopwatch = int(time.time())
 
             def cleanup_before_exit(signum, frame):
+                signal.signal(signal.SIGINT, signal.SIG_IGN)
+                signal.signal(signal.SIGTERM, signal.SIG_IGN)
                 server.stop_server(int(time.time()) - stopwatch)
 
             signal.signal(signal.SIGINT, cleanup_before_exit)
+            signal.signal(signal.SIGTERM, cleanup_before_exit)
             server.start_server()
 
+
+class WorkerSupervisor:
+    """Runs the server in several forked processes sharing one port through SO_REUSEPORT.
+
+    Every worker parses the config itself, the kernel balances incoming connections between them.
+    Workers which crash are restarted; SIGINT or SIGTERM stops all of them.
+    """
+
+    def __init__(self, config, port, workers, **options):
+        self.config = config
+        self.port = port
+        self.workers = workers
+        self.options = options
+        self.context = multiprocessing.get_context('fork')
+        self.processes = {}
+        self.stopping = False
+        self.failed = False
+
+    def run(self):
+        signal.signal(signal.SIGINT, self._on_signal)
+        signal.signal(signal.SIGTERM, self._on_signal)
+
+        for slot in range(self.workers):
+            self._spawn(slot)
+
+        try:
+            self._supervise()
+        finally:
+            self._stop_workers()
+
+        if self.failed:
+            sys.exit(1)
+
+    def _spawn(self, slot):
+        options = {**self.options, 'reuse_port': True}
+        # Every worker counts, logs and traces its own requests.
+        for name in ('metrics_file', 'trace_file'):
+            if options.get(name) is not None:
+                options[name] = f"{options[name]}.{slot}"
+        log_options = options.get('log_options') or {}
+        if log_options.get('log_file') is not None:
+            options['log_options'] = {**log_options, 'log_file': f"{log_options['log_file']}.{slot}"}
+
+        process = self.context.Process(target=CliRunner.serve, name=f"mocogpt-worker-{slot}",
+                                       args=(self.config, self.port), kwargs=options)
+        process.start()
+        self.processes[slot] = (process, time.monotonic())
+        logger.info(f"Worker {slot} started with pid {process.pid}")
+
+    def _supervise(self):
+        while not self.stopping:
+            sentinels = [process.sentinel for process, _ in self.processes.values()]
+            wait(sentinels, timeout=0.5)
+            if self.stopping:
+                return
+
+            for slot, (process, started) in list(self.processes.items()):
+                if process.is_alive():
+                    continue
+
+                process.join()
+                logger.warning(f"Worker {slot} (pid {process.pid}) exited with code {process.exitcode}")
+                if time.monotonic() - started < MIN_WORKER_UPTIME:
+                    logger.error(f"Worker {slot} failed to start, shutting down")
+                    self.failed = True
+                    return
+
+                self._spawn(slot)
+
+    def _on_signal(self, signum, frame):
+        self.stopping = True
+
+    def _stop_workers(self):
+        for process, _ in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+
+        deadline = time.monotonic() + WORKER_STOP_TIMEOUT
+        for process, _ in self.processes.values():
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                process.kill()
+                process.join()
@@ -1,8 +1,14 @@
+import contextvars
+import itertools
 import sys
+import time
 
 from loguru import logger
 
-from mocogpt.core.actual_server import ActualGptServer, Monitor
+from mocogpt.core._trace import TraceMonitor
+from mocogpt.core.actual_server import ActualGptServer, CompositeMonitor, Monitor
+
+from ._logging import LogRecord, LogWriter
 
 logger.remove()
 logger.add(sys.stdout, colorize=True,
@@ -11,20 +17,68 @@ logger.add(sys.stdout, colorize=True,
                   "<red>|</red> <level>{message}</level>")
 
 
+# Whether the request handled by the current task is logged, so its response follows the same sampling.
+_request_sampled = contextvars.ContextVar('request_sampled', default=None)
+
+
 class LogMonitor(Monitor):
+    """Logs requests and responses through a background LogWriter.
+
+    Only 1 in ``sample`` requests is logged, and none when ``level`` is above INFO.
+    """
+
+    def __init__(self, level="INFO", sample=1, max_payload=None, log_file=None):
+        self._enabled = logger.level(level.upper()).no <= logger.level("INFO").no
+        # Streams are logged as one summary each, their chunks only at DEBUG.
+        self.chunk_events = logger.level(level.upper()).no <= logger.level("DEBUG").no
+        self._sample = sample
+        self._counter = itertools.count()
+        self._writer = LogWriter(log_file, max_payload)
+
     def on_server_start(self, server):
+        self._writer.start()
         logger.info("Server started on port {port}", port=server.port)
 
     def on_server_end(self, server, elapsed):
         logger.info("Server stopped")
         logger.info("Total time: {elapsed} seconds", elapsed=elapsed)
+        self._writer.close()
+
+    def _sampled(self) -> bool:
+        return self._enabled and next(self._counter) % self._sample == 0
 
     async def on_session_start(self, request):
-        logger.info(f"Request: {request}")
+        sampled = self._sampled()
+        _request_sampled.set(sampled)
+        if sampled:
+            self._writer.put(LogRecord(time.time(), "INFO", "request", request))
+
+    def _sampled_session(self) -> bool:
+        sampled = _request_sampled.get()
+        if sampled is None:
+            sampled = self._sampled()
+
+        return sampled
 
     async def on_session_end(self, response):
-        logger.info(f"Response: {response}")
+        if self._sampled_session():
+            self._writer.put(LogRecord(time.time(), "INFO", "response", response))
+
+    async def on_stream_chunk(self, frame: bytes):
+        if self._sampled_session():
+            self._writer.put(LogRecord(time.time(), "DEBUG", "chunk", frame))
+
+    async def on_stream_end(self, response, chunks: int, size: int, duration: float):
+        if self._sampled_session():
+            self._writer.put(LogRecord(time.time(), "INFO", "stream", {
+                'id': response.id, 'model': response.model, 'chunks': chunks, 'bytes': size,
+                'duration': round(duration, 6)
+            }))
+
 
+def console_server(port, log_options=None, trace_file=None, **options):
+    monitor = LogMonitor(**(log_options or {}))
+    if trace_file is not None:
+        monitor = CompositeMonitor(monitor, TraceMonitor(trace_file))
 
-def console_server(port):
-    return ActualGptServer(port, monitor=LogMonitor())
+    return ActualGptServer(port, monitor=monitor, **options)
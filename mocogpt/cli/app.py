@@ -3,6 +3,7 @@ import sys
 
 import click
 
+from mocogpt.cli._bench import ENDPOINTS, LoadGenerator, bench, in_process_server, request_body
 from mocogpt.cli._runner import CliRunner
 
 
@@ -14,15 +15,75 @@ def app():
 @click.command()
 @click.argument("config", nargs=1)
 @click.option("--port", "-p", default=12306, help="Port to run the server on.")
-def start(config, port):
+@click.option("--host", default="0.0.0.0", help="Host to bind the server to.")
+@click.option("--backlog", default=128, help="Maximum number of pending connections.")
+@click.option("--workers", "-w", default=1, type=click.IntRange(min=1),
+              help="Number of worker processes sharing the port.")
+@click.option("--loop", default="asyncio", type=click.Choice(["asyncio", "uvloop"]),
+              help="Event loop implementation, uvloop falls back to asyncio when it is not installed.")
+@click.option("--metrics", is_flag=True, default=False, help="Expose Prometheus metrics on /metrics.")
+@click.option("--metrics-file", default=None, help="Write the metrics to this file when the server stops.")
+@click.option("--log-level", default="INFO", type=click.Choice(["DEBUG", "INFO", "WARNING"], case_sensitive=False),
+              help="Requests and responses are logged at INFO.")
+@click.option("--log-sample", default=1, type=click.IntRange(min=1), help="Log 1 in N requests.")
+@click.option("--log-max-payload", default=None, type=click.IntRange(min=0),
+              help="Truncate logged requests and responses to this many characters.")
+@click.option("--log-file", default=None, help="Write requests and responses to this file as NDJSON.")
+@click.option("--trace-file", default=None, help="Write request phases to this file as Chrome trace events.")
+def start(config, port, host, backlog, workers, loop, metrics, metrics_file, log_level, log_sample, log_max_payload,
+          log_file, trace_file):
     if not os.path.exists(config):
         click.echo(f"Error: Config file {config} does not exist.")
         sys.exit(1)
 
-    CliRunner().run(config, port)
+    CliRunner().run(config, port, workers=workers, host=host, backlog=backlog, loop=loop,
+                    expose_metrics=metrics, metrics_file=metrics_file,
+                    log_options={'level': log_level, 'sample': log_sample, 'max_payload': log_max_payload,
+                                 'log_file': log_file},
+                    trace_file=trace_file)
+
+
+@click.command(name="bench")
+@click.option("--url", default="http://localhost:12306/v1", help="Base URL of a running server.")
+@click.option("--config", "-c", default=None, help="Start a server from this config in-process instead.")
+@click.option("--port", "-p", default=12306, help="Port of the in-process server.")
+@click.option("--endpoint", "-e", default="chat", type=click.Choice(list(ENDPOINTS)), help="API to call.")
+@click.option("--stream/--no-stream", default=False, help="Stream chat completions.")
+@click.option("--model", "-m", default=None, help="Model of the requests.")
+@click.option("--prompt", default="Hi", help="Prompt, or embeddings input, of the requests.")
+@click.option("--data", "-d", default=None, help="JSON request body, overriding --model and --prompt.")
+@click.option("--api-key", default="sk-123456789", help="API key sent as bearer token.")
+@click.option("--requests", "-n", default=1000, type=click.IntRange(min=1), help="Total number of requests.")
+@click.option("--concurrency", default=64, type=click.IntRange(min=1), help="Number of concurrent clients.")
+@click.option("--connections", default=None, type=click.IntRange(min=1),
+              help="Size of the connection pool, defaults to the concurrency.")
+@click.option("--timeout", default=30.0, help="Timeout of a request in seconds.")
+@click.option("--loop", default="asyncio", type=click.Choice(["asyncio", "uvloop"]), help="Event loop implementation.")
+def bench_command(url, config, port, endpoint, stream, model, prompt, data, api_key, requests, concurrency,
+                  connections, timeout, loop):
+    if config is not None and not os.path.exists(config):
+        click.echo(f"Error: Config file {config} does not exist.")
+        sys.exit(1)
+
+    if config is not None:
+        url = f"http://localhost:{port}/v1"
+
+    generator = LoadGenerator(url.rstrip("/") + ENDPOINTS[endpoint],
+                              request_body(endpoint, model=model, prompt=prompt, stream=stream, data=data),
+                              headers={"Authorization": f"Bearer {api_key}"},
+                              requests=requests, concurrency=concurrency, connections=connections, timeout=timeout)
+
+    if config is None:
+        result = bench(generator, loop)
+    else:
+        with in_process_server(config, port, loop):
+            result = bench(generator, loop)
+
+    click.echo(result.report())
 
 
 app.add_command(start)
+app.add_command(bench_command)
 
 if __name__ == '__main__':
     app()
@@ -0,0 +1,267 @@
+import heapq
+import re
+from itertools import islice
+
+from mocogpt.core._substring import AhoCorasick, PrefixTrie, SuffixTrie
+from mocogpt.core.base_typing import (
+    AllOfMatcher,
+    RegexOperator,
+    RequestMatcher,
+    UnaryOperatorMatcher,
+    UnaryOperatorType,
+    VarargOperatorMatcher,
+    VarargOperatorType,
+)
+
+INDEXABLE_FIELDS = ('prompt', 'model', 'input', 'api_key')
+SUBSTRING_FIELDS = ('prompt', 'input')
+MIN_SUBSTRING_SESSIONS = 16
+
+
+class ExactIndex:
+    def __init__(self, field: str):
+        self.field = field
+        self.table = {}
+        self.positions = []
+
+    def add(self, position: int, args: list):
+        for arg in args:
+            positions = self.table.setdefault(arg, [])
+            if not positions or positions[-1] != position:
+                positions.append(position)
+
+        self.positions.append(position)
+
+    def build(self):
+        pass
+
+    def candidates(self, request):
+        try:
+            return self.table.get(getattr(request, self.field), ())
+        except Exception:
+            # Let the sessions raise from match() in registration order, as the linear scan would.
+            return self.positions
+
+
+class SubstringIndex(ExactIndex):
+    engines = {
+        UnaryOperatorType.CONTAINS: AhoCorasick,
+        UnaryOperatorType.STARTSWITH: PrefixTrie,
+        UnaryOperatorType.ENDSWITH: SuffixTrie,
+    }
+
+    def __init__(self, field: str, _type: UnaryOperatorType):
+        super().__init__(field)
+        self.type = _type
+        self.engine = None
+        self.outputs = []
+
+    def build(self):
+        patterns = list(self.table)
+        self.outputs = [self.table[pattern] for pattern in patterns]
+        self.engine = SubstringIndex.engines[self.type](patterns)
+
+    def candidates(self, request):
+        try:
+            text = getattr(request, self.field)
+        except Exception:
+            return self.positions
+
+        if not isinstance(text, str):
+            return self.positions
+
+        found = self.engine.search(text)
+        if len(found) <= 1:
+            return self.outputs[found.pop()] if found else ()
+
+        return sorted({position for pattern_id in found for position in self.outputs[pattern_id]})
+
+
+# Numbered back references and conditionals would point at the wrong group once combined.
+_GROUP_REFERENCE = re.compile(r'\\[1-9]|\(\?\(')
+
+
+def _combinable(operator: RegexOperator) -> bool:
+    if not isinstance(operator.arg, str) or operator.pattern.groupindex or _GROUP_REFERENCE.search(operator.arg):
+        return False
+
+    try:
+        re.compile(f"(?:{operator.arg})", operator.flags)
+    except re.error:
+        return False
+
+    return True
+
+
+class RegexIndex(ExactIndex):
+    """Combines the regex sessions of a field into alternations with one named group per session.
+
+    Alternatives are tried in registration order, so the group which matches is the first session
+    whose pattern matches. Sessions after it are still candidates, since the session itself may
+    fail on its other matchers.
+    """
+
+    def __init__(self, field: str):
+        super().__init__(field)
+        self.alternatives = []
+        self.combined = []
+        self.loose = []
+
+    def add(self, position: int, args: list):
+        self.alternatives.extend((position, operator) for operator in args)
+        self.positions.append(position)
+
+    def build(self):
+        groups = {}
+        loose = set()
+        for position, operator in self.alternatives:
+            if _combinable(operator):
+                groups.setdefault((operator.mode, operator.flags), []).append((position, operator))
+            else:
+                loose.add(position)
+
+        for (mode, flags), alternatives in groups.items():
+            pattern = '|'.join(f"(?P<s{index}>{operator.arg})"
+                               for index, (_, operator) in enumerate(alternatives))
+            try:
+                combined = re.compile(pattern, flags)
+            except re.error:
+                loose.update(position for position, _ in alternatives)
+                continue
+
+            positions = [position for position, _ in alternatives]
+            self.combined.append((getattr(combined, mode), positions))
+
+        self.loose = sorted(loose)
+
+    def candidates(self, request):
+        try:
+            text = getattr(request, self.field)
+        except Exception:
+            return self.positions
+
+        if not isinstance(text, str):
+            return self.positions
+
+        candidates = [self.loose] if self.loose else []
+        for match, positions in self.combined:
+            matched = match(text)
+            if matched is not None:
+                candidates.append(islice(positions, int(matched.lastgroup[1:]), None))
+
+        if len(candidates) == 1:
+            return candidates[0]
+
+        return heapq.merge(*candidates)
+
+
+_PRIORITIES = {
+    UnaryOperatorType.EQUALS: 0,
+    UnaryOperatorType.STARTSWITH: 1,
+    UnaryOperatorType.ENDSWITH: 2,
+    UnaryOperatorType.CONTAINS: 3,
+    UnaryOperatorType.REGEX: 4,
+}
+
+
+def _hashable(arg) -> bool:
+    try:
+        hash(arg)
+    except TypeError:
+        return False
+
+    return True
+
+
+def _unary_key(matcher: UnaryOperatorMatcher):
+    field = getattr(matcher.extractor, 'name', None)
+    _type = matcher.operator.type
+    arg = matcher.operator.arg
+
+    if _type == UnaryOperatorType.EQUALS and field in INDEXABLE_FIELDS and _hashable(arg):
+        return _type, field, [arg]
+
+    if _type in SubstringIndex.engines and field in SUBSTRING_FIELDS and isinstance(arg, str):
+        return _type, field, [arg]
+
+    if (_type == UnaryOperatorType.REGEX and field in SUBSTRING_FIELDS
+            and isinstance(matcher.operator, RegexOperator) and matcher.operator.mode != 'search'):
+        return _type, field, [matcher.operator]
+
+    return None
+
+
+def _index_key(matcher: RequestMatcher):
+    if isinstance(matcher, UnaryOperatorMatcher):
+        return _unary_key(matcher)
+
+    if isinstance(matcher, VarargOperatorMatcher) and matcher.operator.type == VarargOperatorType.ANY_OF:
+        keys = [_index_key(child) for child in matcher.matchers]
+        if not keys or any(key is None or key[:2] != keys[0][:2] for key in keys):
+            return None
+
+        return keys[0][0], keys[0][1], [arg for _, _, args in keys for arg in args]
+
+    if isinstance(matcher, AllOfMatcher):
+        keys = [key for child in matcher.matchers if (key := _index_key(child)) is not None]
+        if keys:
+            return min(keys, key=lambda key: (_PRIORITIES[key[0]], INDEXABLE_FIELDS.index(key[1])))
+
+    return None
+
+
+def _create_index(_type: UnaryOperatorType, field: str):
+    if _type == UnaryOperatorType.EQUALS:
+        return ExactIndex(field)
+
+    if _type == UnaryOperatorType.REGEX:
+        return RegexIndex(field)
+
+    return SubstringIndex(field, _type)
+
+
+class SessionDispatcher:
+    def __init__(self, sessions: list, combine_regex=False):
+        self.sessions = sessions
+        self.indexes = {}
+        self.fallback = []
+
+        for position, session in enumerate(sessions):
+            key = _index_key(session._matcher)
+            if key is None or (key[0] == UnaryOperatorType.REGEX and not combine_regex):
+                self.fallback.append(position)
+                continue
+
+            _type, field, args = key
+            if (_type, field) not in self.indexes:
+                self.indexes[(_type, field)] = _create_index(_type, field)
+            self.indexes[(_type, field)].add(position, args)
+
+        for key, index in list(self.indexes.items()):
+            # A handful of substring checks is cheaper than walking an automaton.
+            if isinstance(index, SubstringIndex) and len(index.positions) < MIN_SUBSTRING_SESSIONS:
+                self.fallback.extend(index.positions)
+                del self.indexes[key]
+            else:
+                index.build()
+
+        self.fallback.sort()
+
+    def dispatch(self, request):
+        sessions = self.sessions
+        for position in self._candidates(request):
+            session = sessions[position]
+            if session.match(request):
+                return session
+
+        return None
+
+    def _candidates(self, request):
+        candidates = [positions for index in self.indexes.values() if (positions := index.candidates(request))]
+        if self.fallback:
+            candidates.append(self.fallback)
+
+        if len(candidates) == 1:
+            return candidates[0]
+
+        return heapq.merge(*candidates)
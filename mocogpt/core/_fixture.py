@@ -0,0 +1,108 @@
+import ast
+import json
+import mmap
+import struct
+import sys
+from array import array
+
+from mocogpt.core._vector import Vector
+
+NPY_MAGIC = b'\x93NUMPY'
+FLOAT32_SIZE = 4
+# Dtypes of little-endian float32 arrays, '=' and '' being native ones.
+_FLOAT32_DESCRS = ('<f4', '=f4', 'f4') if sys.byteorder == 'little' else ('<f4',)
+
+
+def read_npy_header(buffer) -> tuple[tuple, int]:
+    """Reads the header of a .npy file holding a 2-D float32 array, returns its shape and data offset."""
+    if buffer[:len(NPY_MAGIC)] != NPY_MAGIC:
+        raise ValueError("Not a .npy file")
+
+    major = buffer[6]
+    if major == 1:
+        (header_length,), start = struct.unpack_from('<H', buffer, 8), 10
+    elif major in (2, 3):
+        (header_length,), start = struct.unpack_from('<I', buffer, 8), 12
+    else:
+        raise ValueError(f"Unsupported .npy version {major}")
+
+    header = ast.literal_eval(bytes(buffer[start:start + header_length]).decode('latin1'))
+    if header['descr'] not in _FLOAT32_DESCRS:
+        raise ValueError(f"Expected little-endian float32 vectors, got {header['descr']}")
+
+    if header['fortran_order']:
+        raise ValueError("Expected vectors stored in row-major order")
+
+    if len(header['shape']) != 2:
+        raise ValueError(f"Expected a 2-D array of vectors, got shape {header['shape']}")
+
+    return header['shape'], start + header_length
+
+
+class VectorFile:
+    """Rows of float32 vectors read from a memory-mapped .npy or raw little-endian float32 file.
+
+    Only the rows read are paged in, and the pages are shared with every process mapping the same file.
+    Raw files need the ``dimensions`` of their rows.
+    """
+
+    def __init__(self, path: str, dimensions: int = None):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[:len(NPY_MAGIC)] == NPY_MAGIC:
+            (self.rows, self.dimensions), self._offset = read_npy_header(self._mmap)
+            if dimensions is not None and dimensions != self.dimensions:
+                raise ValueError(f"Expected {dimensions} dimensions, {path} has {self.dimensions}")
+        else:
+            if dimensions is None or dimensions <= 0:
+                raise ValueError(f"Dimensions are required to read raw float32 vectors from {path}")
+
+            row_size = dimensions * FLOAT32_SIZE
+            if len(self._mmap) % row_size:
+                raise ValueError(f"Size of {path} is not a multiple of {dimensions} float32 values")
+
+            self.rows, self.dimensions, self._offset = len(self._mmap) // row_size, dimensions, 0
+
+        if self._offset + self.rows * self.dimensions * FLOAT32_SIZE > len(self._mmap):
+            raise ValueError(f"{path} is shorter than its {self.rows} rows")
+
+    def vector(self, row: int) -> Vector:
+        if not 0 <= row < self.rows:
+            raise IndexError(f"Row {row} out of range of {self.rows} rows in {self.path}")
+
+        row_size = self.dimensions * FLOAT32_SIZE
+        start = self._offset + row * row_size
+        values = array('f')
+        values.frombytes(self._mmap[start:start + row_size])
+        if sys.byteorder == 'big':
+            values.byteswap()
+
+        return Vector(values)
+
+    def close(self):
+        self._mmap.close()
+
+
+def load_rows(path: str) -> dict:
+    """Reads which row holds the vector of each input.
+
+    A .json file holds either an object from inputs to rows, or a list of inputs in row order.
+    Any other file holds one input per line, in row order.
+    """
+    if path.endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            rows = json.load(f)
+
+        if isinstance(rows, list):
+            return {_input: row for row, _input in enumerate(rows)}
+
+        for _input, row in rows.items():
+            if isinstance(row, bool) or not isinstance(row, int):
+                raise ValueError(f"Row of {_input!r} in {path} must be an integer, got {row!r}")
+
+        return rows
+
+    with open(path, encoding='utf-8') as f:
+        return {line.rstrip('\r\n'): row for row, line in enumerate(f)}
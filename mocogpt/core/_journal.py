@@ -0,0 +1,65 @@
+from collections import deque
+
+DEFAULT_JOURNAL_CAPACITY = 1000
+# Which requests a full journal gives up: the oldest ones, or the new ones as they arrive.
+EVICTIONS = ('oldest', 'newest')
+
+
+class RequestJournal:
+    """Keeps the last ``capacity`` requests received, and counts all of them.
+
+    Verification relies on the count, so it stays exact however many requests were evicted, while
+    memory is bounded by the capacity. With ``eviction='newest'`` the journal keeps the first
+    requests instead.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_JOURNAL_CAPACITY, eviction: str = 'oldest'):
+        if capacity < 0:
+            raise ValueError(f"Journal capacity must not be negative, got {capacity}")
+
+        if eviction not in EVICTIONS:
+            raise ValueError(f"Unknown eviction {eviction}, expected one of {', '.join(EVICTIONS)}")
+
+        self.capacity = capacity
+        self.eviction = eviction
+        self.count = 0
+        self._entries = deque(maxlen=capacity)
+
+    def record(self, request):
+        self.count += 1
+        if self.eviction == 'newest' and len(self._entries) == self.capacity:
+            return
+
+        self._entries.append(request)
+
+    @property
+    def evicted(self) -> int:
+        return self.count - len(self._entries)
+
+    def clear(self):
+        self.count = 0
+        self._entries.clear()
+
+    def verify(self, times=None, at_least=None, at_most=None):
+        """Asserts how many requests were received, by default that there was at least one."""
+        if times is None and at_least is None and at_most is None:
+            at_least = 1
+
+        count = self.count
+        if times is not None and count != times:
+            raise AssertionError(f"Expected {times} requests, but received {count}")
+
+        if at_least is not None and count < at_least:
+            raise AssertionError(f"Expected at least {at_least} requests, but received {count}")
+
+        if at_most is not None and count > at_most:
+            raise AssertionError(f"Expected at most {at_most} requests, but received {count}")
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(list(self._entries))
+
+    def __getitem__(self, index):
+        return self._entries[index]
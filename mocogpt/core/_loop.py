@@ -0,0 +1,40 @@
+import asyncio
+import logging
+from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
+
+LoopFactory = Callable[[], asyncio.AbstractEventLoop]
+
+
+def _uvloop() -> asyncio.AbstractEventLoop:
+    try:
+        import uvloop
+    except ImportError:
+        logger.warning("uvloop is not installed, falling back to the asyncio event loop")
+        return asyncio.new_event_loop()
+
+    return uvloop.new_event_loop()
+
+
+LOOP_FACTORIES: dict[str, LoopFactory] = {
+    'asyncio': asyncio.new_event_loop,
+    'uvloop': _uvloop,
+}
+
+
+def loop_factory(loop: str | LoopFactory | None) -> LoopFactory:
+    """Resolves a loop name, or a callable creating an event loop, to a loop factory.
+
+    "uvloop" falls back to the asyncio loop, with a warning, when uvloop is not installed.
+    """
+    if loop is None:
+        return asyncio.new_event_loop
+
+    if callable(loop):
+        return loop
+
+    if loop not in LOOP_FACTORIES:
+        raise ValueError(f"Unknown event loop: {loop}, expected one of {', '.join(LOOP_FACTORIES)}")
+
+    return LOOP_FACTORIES[loop]
@@ -0,0 +1,125 @@
+import bisect
+import math
+
+# Latencies of a mock are mostly microseconds, so buckets start far below the usual Prometheus defaults.
+DEFAULT_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra='') -> str:
+    labels = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        labels.append(extra)
+
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+
+    return str(value)
+
+
+class Metric:
+    type = 'untyped'
+
+    def __init__(self, name: str, description: str, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.values = {}
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield self.name + _format_labels(self.labels, labels), value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(f"{name} {_format_value(value)}" for name, value in self.samples())
+        return lines
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, labels=(), amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def __init__(self, name: str, description: str, labels=()):
+        super().__init__(name, description, labels)
+        if not self.labels:
+            self.values[()] = 0
+
+    def inc(self, labels=(), amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, labels=(), amount=1):
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, description: str, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, value: float):
+        series = self.values.get(labels)
+        if series is None:
+            # Counts per bucket, the overflow count, then sum and count.
+            series = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def samples(self):
+        for labels, series in self.values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), series):
+                cumulative += count
+                yield self.name + '_bucket' + _format_labels(self.labels, labels, f'le="{_format_value(bound)}"'), \
+                    cumulative
+
+            yield self.name + '_sum' + _format_labels(self.labels, labels), series[-2]
+            yield self.name + '_count' + _format_labels(self.labels, labels), series[-1]
+
+
+class Metrics:
+    """Counters of a server, updated from its event loop only, so they need no locking."""
+
+    def __init__(self):
+        self.requests = Counter('mocogpt_requests_total', 'Requests handled.', ('endpoint', 'session', 'status'))
+        self.unmatched = Counter('mocogpt_unmatched_requests_total', 'Requests no session matched.', ('endpoint',))
+        self.match_seconds = Histogram('mocogpt_match_seconds', 'Time spent matching sessions.', ('endpoint',))
+        self.render_seconds = Histogram('mocogpt_render_seconds',
+                                        'Time spent running handlers and serializing responses.', ('endpoint',))
+        self.write_seconds = Histogram('mocogpt_write_seconds', 'Time spent writing responses.', ('endpoint',))
+        self.streams_in_flight = Gauge('mocogpt_streams_in_flight', 'Streams being written.')
+        self.bytes_written = Counter('mocogpt_bytes_written_total', 'Bytes of response bodies written.',
+                                     ('endpoint',))
+
+    def all(self) -> list[Metric]:
+        return [self.requests, self.unmatched, self.match_seconds, self.render_seconds, self.write_seconds,
+                self.streams_in_flight, self.bytes_written]
+
+    def render(self) -> str:
+        return '\n'.join(line for metric in self.all() for line in metric.render()) + '\n'
+
+    def dump(self, path: str):
+        with open(path, 'w') as f:
+            f.write(self.render())
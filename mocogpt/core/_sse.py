@@ -103,6 +103,14 @@ class EventSourceResponse(StreamResponse):
         buffer.write(self._sep)
         await self.write(buffer.getvalue().encode("utf-8"))
 
+    async def send_frame(self, frame: bytes):
+        """Send an event which is already rendered and encoded, including
+        its ``data:`` field and the trailing blank line.
+
+        :param bytes frame: The complete event.
+        """
+        await self.write(frame)
+
     async def wait(self):
         """EventSourceResponse object is used for streaming data to the client,
         this method returns future, so we can wait until connection will
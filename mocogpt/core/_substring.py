@@ -0,0 +1,107 @@
+from collections import deque
+
+_TERMINAL = ''
+
+
+class AhoCorasick:
+    """Finds every pattern occurring in a text with a single pass over it."""
+
+    def __init__(self, patterns: list[str]):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+        for pattern_id, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][char] = next_state
+                state = next_state
+            self._output[state].append(pattern_id)
+
+        # _report[state] is the nearest state, following failure links from state itself,
+        # which ends a pattern; _next_report chains the remaining ones.
+        self._report = [0] * len(self._goto)
+        self._next_report = [0] * len(self._goto)
+        queue = deque()
+        for state in self._goto[0].values():
+            self._report[state] = state if self._output[state] else 0
+            queue.append(state)
+
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+
+                self._fail[next_state] = fail
+                self._next_report[next_state] = self._report[fail]
+                self._report[next_state] = next_state if self._output[next_state] else self._report[fail]
+                queue.append(next_state)
+
+    def search(self, text: str) -> set[int]:
+        goto, fail, output = self._goto, self._fail, self._output
+        report, next_report = self._report, self._next_report
+        found = set(output[0])
+        state = 0
+
+        for char in text:
+            while True:
+                next_state = goto[state].get(char)
+                if next_state is not None:
+                    state = next_state
+                    break
+                if state == 0:
+                    break
+                state = fail[state]
+
+            matched = report[state]
+            while matched:
+                found.update(output[matched])
+                matched = next_report[matched]
+
+        return found
+
+
+class PrefixTrie:
+    """Finds every pattern the text starts with."""
+
+    def __init__(self, patterns: list[str]):
+        self._root = {}
+        for pattern_id, pattern in enumerate(patterns):
+            node = self._root
+            for char in self._chars(pattern):
+                node = node.setdefault(char, {})
+            node.setdefault(_TERMINAL, []).append(pattern_id)
+
+    def _chars(self, text: str):
+        return text
+
+    def search(self, text: str) -> set[int]:
+        found = set()
+        node = self._root
+        for char in self._chars(text):
+            if _TERMINAL in node:
+                found.update(node[_TERMINAL])
+            node = node.get(char)
+            if node is None:
+                return found
+
+        if _TERMINAL in node:
+            found.update(node[_TERMINAL])
+
+        return found
+
+
+class SuffixTrie(PrefixTrie):
+    """Finds every pattern the text ends with."""
+
+    def _chars(self, text: str):
+        return reversed(text)
@@ -0,0 +1,56 @@
+import json
+import uuid
+
+
+class Placeholder:
+    def __init__(self, name: str):
+        self.name = name
+
+
+def encode_value(value) -> bytes:
+    if type(value) is int:
+        return b'%d' % value
+
+    return json.dumps(value).encode()
+
+
+class JsonTemplate:
+    """A JSON document serialized once, with holes for the values which change between requests.
+
+    The output is byte-for-byte what ``json.dumps`` would produce for the filled-in document.
+    """
+
+    def __init__(self, document):
+        marker = uuid.uuid4().hex
+        names = []
+
+        def default(value):
+            if isinstance(value, Placeholder):
+                names.append(value.name)
+                return marker
+
+            raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+        segments = json.dumps(document, default=default).split(f'"{marker}"')
+        self._names = names
+        self._head = segments[0].encode()
+        self._tail = [segment.encode() for segment in segments[1:]]
+
+    def segments(self, **values) -> list[bytes]:
+        """Fills in the given values and returns the bytes around the holes left open."""
+        segments = [self._head]
+        for name, segment in zip(self._names, self._tail):
+            if name in values:
+                segments[-1] += encode_value(values[name]) + segment
+            else:
+                segments.append(segment)
+
+        return segments
+
+    def render(self, **values) -> bytes:
+        chunks = [self._head]
+        for name, segment in zip(self._names, self._tail):
+            chunks.append(encode_value(values[name]))
+            chunks.append(segment)
+
+        return b''.join(chunks)
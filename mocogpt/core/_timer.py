@@ -0,0 +1,81 @@
+import asyncio
+import heapq
+import math
+
+DEFAULT_RESOLUTION = 0.005
+
+
+class TimerWheel:
+    """Shares event loop timers between many sleepers.
+
+    Deadlines are rounded up to the next tick of ``resolution`` seconds. All sleepers of a tick
+    are woken by a single loop callback, so the loop keeps one timer for the next busy tick
+    instead of one per sleeping stream.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, resolution=DEFAULT_RESOLUTION):
+        self._loop = loop
+        self._resolution = resolution
+        self._slots = {}
+        self._ticks = []
+        self._handle = None
+        self._next_tick = None
+
+    def time(self) -> float:
+        return self._loop.time()
+
+    def sleep(self, delay: float) -> asyncio.Future:
+        return self.sleep_until(self._loop.time() + delay)
+
+    def sleep_until(self, deadline: float) -> asyncio.Future:
+        future = self._loop.create_future()
+        if deadline <= self._loop.time():
+            future.set_result(None)
+            return future
+
+        tick = math.ceil(deadline / self._resolution)
+        slot = self._slots.get(tick)
+        if slot is None:
+            self._slots[tick] = [future]
+            heapq.heappush(self._ticks, tick)
+            self._schedule(tick)
+        else:
+            slot.append(future)
+
+        return future
+
+    def _schedule(self, tick: int):
+        if self._next_tick is not None and self._next_tick <= tick:
+            return
+
+        if self._handle is not None:
+            self._handle.cancel()
+
+        self._next_tick = tick
+        self._handle = self._loop.call_at(tick * self._resolution, self._fire)
+
+    def _fire(self):
+        self._handle = None
+        self._next_tick = None
+        due = max(math.floor(self._loop.time() / self._resolution), self._ticks[0])
+
+        while self._ticks and self._ticks[0] <= due:
+            for future in self._slots.pop(heapq.heappop(self._ticks)):
+                if not future.done():
+                    future.set_result(None)
+
+        if self._ticks:
+            self._schedule(self._ticks[0])
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+        for slot in self._slots.values():
+            for future in slot:
+                future.cancel()
+
+        self._slots.clear()
+        self._ticks.clear()
+        self._next_tick = None
@@ -0,0 +1,54 @@
+import time
+
+# Phases in the order a request goes through them. Streams repeat serialize, delay and write per chunk.
+READ = 'read'
+DECODE = 'decode'
+REQUEST = 'request'
+MATCH = 'match'
+HANDLER = 'handler'
+DELAY = 'delay'
+SERIALIZE = 'serialize'
+WRITE = 'write'
+
+
+class RequestTiming:
+    """Durations of the phases of one request, measured between consecutive marks.
+
+    Durations of a phase which occurs more than once are summed. With ``spans`` every occurrence
+    is also kept as ``(phase, start, duration)``, for monitors which draw a timeline.
+    """
+
+    __slots__ = ('endpoint', 'session', 'status', 'size', 'start', 'end', 'durations', 'spans', '_mark')
+
+    def __init__(self, endpoint: str, spans=False):
+        self.endpoint = endpoint
+        self.session = None
+        self.status = None
+        self.size = 0
+        self.start = self._mark = time.perf_counter()
+        self.end = None
+        self.durations = {}
+        self.spans = [] if spans else None
+
+    def mark(self, phase: str):
+        """Ends the current phase, which began at the previous mark."""
+        now = time.perf_counter()
+        duration = now - self._mark
+        self.durations[phase] = self.durations.get(phase, 0.0) + duration
+        if self.spans is not None:
+            self.spans.append((phase, self._mark, duration))
+        self._mark = now
+
+    def skip(self):
+        """Leaves the time since the previous mark out of every phase."""
+        self._mark = time.perf_counter()
+
+    def finish(self, session: str, status: int, size: int = 0):
+        self.session = session
+        self.status = status
+        self.size = size
+        self.end = time.perf_counter()
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
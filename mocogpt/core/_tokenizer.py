@@ -0,0 +1,102 @@
+import codecs
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import cache
+
+import tiktoken
+
+DEFAULT_COUNT_CACHE_SIZE = 65536
+DEFAULT_PREFIX_CACHE_SIZE = 16384
+
+
+class LruCache:
+    def __init__(self, maxsize: int):
+        self._maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            if len(self._items) > self._maxsize:
+                self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+def digest(content: str) -> bytes:
+    return hashlib.blake2b(content.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+class Tokenizer:
+    def __init__(self, count_cache_size=DEFAULT_COUNT_CACHE_SIZE, prefix_cache_size=DEFAULT_PREFIX_CACHE_SIZE):
+        self._counts = LruCache(count_cache_size)
+        self._prefixes = LruCache(prefix_cache_size)
+
+    @staticmethod
+    @cache
+    def encoding(model: str) -> tiktoken.Encoding:
+        return tiktoken.encoding_for_model(model)
+
+    def count(self, model: str, content: str) -> int:
+        encoding = self.encoding(model)
+        return self._count(encoding, (encoding.name, digest(content)), content)
+
+    def _count(self, encoding: tiktoken.Encoding, key, content: str) -> int:
+        count = self._counts.get(key)
+        if count is None:
+            count = len(encoding.encode(content))
+            self._counts.put(key, count)
+
+        return count
+
+    def count_messages(self, model: str, contents: list[str]) -> int:
+        """Counts the tokens of a conversation.
+
+        Every prefix of the conversation is identified by a hash chain over its message digests,
+        so a conversation which extends an earlier one only counts the messages appended since.
+        """
+        encoding = self.encoding(model)
+        digests = [digest(content) for content in contents]
+
+        chain = hashlib.blake2b(encoding.name.encode(), digest_size=16).digest()
+        chains = []
+        for message_digest in digests:
+            chain = hashlib.blake2b(chain + message_digest, digest_size=16).digest()
+            chains.append(chain)
+
+        start, total = 0, 0
+        for index in range(len(chains) - 1, -1, -1):
+            cached = self._prefixes.get(chains[index])
+            if cached is not None:
+                start, total = index + 1, cached
+                break
+
+        if start == len(contents):
+            return total
+
+        for index in range(start, len(contents)):
+            total += self._count(encoding, (encoding.name, digests[index]), contents[index])
+
+        self._prefixes.put(chains[-1], total)
+        return total
+
+    def split(self, model: str, content: str) -> list[str]:
+        encoding = self.encoding(model)
+        # A token may end in the middle of a UTF-8 sequence, which then joins the next part.
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        parts = [decoder.decode(encoding.decode_single_token_bytes(token)) for token in encoding.encode(content)]
+        return [part for part in parts if part]
+
+
+tokenizer = Tokenizer()
@@ -0,0 +1,70 @@
+import json
+import os
+
+from mocogpt.core._timing import RequestTiming
+from mocogpt.core.actual_server import Monitor
+
+TRACE_BUFFER_SIZE = 1 << 20
+
+
+class TraceMonitor(Monitor):
+    """Writes the phases of every request to a file in Chrome trace-event format.
+
+    The file is a JSON array of complete events, one per request with its phases nested below it,
+    and can be opened in chrome://tracing or https://ui.perfetto.dev. Overlapping requests are
+    placed on separate lanes, shown as threads.
+    """
+
+    timing_spans = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._pid = None
+        self._lanes = []
+
+    def on_server_start(self, server):
+        self._pid = os.getpid()
+        self._file = open(self.path, 'w', buffering=TRACE_BUFFER_SIZE, encoding='utf-8')
+        self._file.write('[')
+        self._write({'name': 'process_name', 'ph': 'M', 'pid': self._pid, 'args': {'name': f"mocogpt:{server.port}"}},
+                    first=True)
+
+    def on_server_end(self, server, elapsed):
+        if self._file is not None:
+            self._file.write(']\n')
+            self._file.close()
+            self._file = None
+
+    async def on_request_timing(self, timing: RequestTiming):
+        if self._file is None:
+            return
+
+        lane = self._lane(timing.start, timing.end)
+        self._write({
+            'name': timing.endpoint, 'cat': 'request', 'ph': 'X', 'pid': self._pid, 'tid': lane,
+            'ts': timing.start * 1e6, 'dur': (timing.end - timing.start) * 1e6,
+            'args': {'session': timing.session, 'status': timing.status, 'bytes': timing.size},
+        })
+
+        for phase, start, duration in timing.spans:
+            self._write({
+                'name': phase, 'cat': 'phase', 'ph': 'X', 'pid': self._pid, 'tid': lane,
+                'ts': start * 1e6, 'dur': duration * 1e6,
+            })
+
+    def _lane(self, start: float, end: float) -> int:
+        # Requests are reported as they end, so a lane whose last request ended before this one
+        # started holds no request overlapping it.
+        for lane, lane_end in enumerate(self._lanes):
+            if lane_end <= start:
+                self._lanes[lane] = end
+                return lane
+
+        self._lanes.append(end)
+        return len(self._lanes) - 1
+
+    def _write(self, event: dict, first=False):
+        if not first:
+            self._file.write(',\n')
+        self._file.write(json.dumps(event))
@@ -0,0 +1,125 @@
+import base64
+import hashlib
+import json
+import math
+import struct
+import sys
+import weakref
+from array import array
+
+_float32 = struct.Struct('<f')
+# Maps an unsigned 32-bit word onto [-1, 1).
+_WORD_SCALE = 2.0 / (1 << 32)
+
+
+def shortest_float32(value: float) -> float:
+    """Returns the shortest decimal which reads back as the same float32, as a float.
+
+    Widened to a double, the float32 nearest to 0.002253932 prints as 0.0022539319936186075, which is
+    not what was configured, so floats are written with the fewest digits identifying their float32.
+    """
+    if value != value or value in (float('inf'), float('-inf')):
+        return value
+
+    # Nine digits identify any float32, and a precision which does keeps doing so above it.
+    shortest = float(f"{value:.9g}")
+    low, high = 1, 9
+    while low < high:
+        precision = (low + high) // 2
+        candidate = float(f"{value:.{precision}g}")
+        if _float32.unpack(_float32.pack(candidate))[0] == value:
+            shortest, high = candidate, precision
+        else:
+            low = precision + 1
+
+    return shortest
+
+
+class Vector:
+    """An embedding stored as a float32 array, serialized once per encoding format."""
+
+    __slots__ = ('values', '_fragments', '__weakref__')
+
+    def __init__(self, values):
+        self.values = values if isinstance(values, array) and values.typecode == 'f' else array('f', values)
+        self._fragments = {}
+
+    def __len__(self):
+        return len(self.values)
+
+    def floats(self) -> list[float]:
+        return json.loads(self.fragment('float'))
+
+    def base64(self) -> str:
+        """Encodes the vector as the API does: base64 of its little-endian float32 bytes."""
+        values = self.values
+        if sys.byteorder == 'big':
+            values = array('f', values)
+            values.byteswap()
+
+        return base64.b64encode(values.tobytes()).decode('ascii')
+
+    def encode(self, encoding_format: str | None):
+        if encoding_format == 'base64':
+            return self.base64()
+
+        return self.floats()
+
+    def fragment(self, encoding_format: str | None) -> bytes:
+        """Returns the vector serialized as JSON in the given format, to be spliced into responses."""
+        encoding_format = 'base64' if encoding_format == 'base64' else 'float'
+        fragment = self._fragments.get(encoding_format)
+        if fragment is None:
+            if encoding_format == 'base64':
+                fragment = b'"%s"' % self.base64().encode('ascii')
+            else:
+                fragment = json.dumps([shortest_float32(value) for value in self.values]).encode()
+            self._fragments[encoding_format] = fragment
+
+        return fragment
+
+
+def as_vector(values) -> Vector:
+    if isinstance(values, Vector):
+        return values
+
+    return Vector(values)
+
+
+# Vectors configured more than once, by digest of their values, while any session uses them.
+_interned = weakref.WeakValueDictionary()
+
+
+def intern_vector(values) -> Vector:
+    """Returns the vector already configured with the same values if any, so its forms are kept only once."""
+    vector = as_vector(values)
+    key = hashlib.blake2b(vector.values.tobytes(), digest_size=16).digest()
+    interned = _interned.get(key)
+    if interned is not None and interned.values == vector.values:
+        return interned
+
+    _interned[key] = vector
+    return vector
+
+
+def normalize(components: list[float]) -> Vector:
+    norm = math.hypot(*components)
+    if norm == 0.0:
+        return Vector(components)
+
+    scale = 1.0 / norm
+    return Vector([component * scale for component in components])
+
+
+def hashed_words(key: bytes, count: int) -> array:
+    """Derives ``count`` unsigned 32-bit words from ``key`` with one digest, the same on every platform."""
+    words = array('I', hashlib.shake_256(key).digest(4 * count))
+    if sys.byteorder == 'big':
+        words.byteswap()
+
+    return words
+
+
+def hashed_unit_vector(key: bytes, dimensions: int) -> Vector:
+    """Derives a unit vector from ``key``, one component per hashed word."""
+    return normalize([word * _WORD_SCALE - 1.0 for word in hashed_words(key, dimensions)])
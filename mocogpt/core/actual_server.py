@@ -1,18 +1,38 @@
 import asyncio
 import json
 import threading
+import time
 import types
+from functools import partial
 
 from aiohttp import web
 
+from mocogpt.core._dispatch import SessionDispatcher
+from mocogpt.core._journal import DEFAULT_JOURNAL_CAPACITY, RequestJournal
+from mocogpt.core._loop import loop_factory
+from mocogpt.core._metrics import CONTENT_TYPE, Metrics
 from mocogpt.core._sse import EventSourceResponse
+from mocogpt.core._timer import TimerWheel
+from mocogpt.core._timing import DECODE, DELAY, HANDLER, MATCH, READ, REQUEST, SERIALIZE, WRITE, RequestTiming
 from mocogpt.core.base_server import GptServer
 from mocogpt.core.base_typing import Request, SessionContext
 from mocogpt.core.chat_completions import Chat, Completions, CompletionsRequest, CompletionsResponse
 from mocogpt.core.embeddings import Embeddings, EmbeddingsRequest, EmbeddingsResponse
 
+CHAT_COMPLETIONS = 'chat.completions'
+EMBEDDINGS = 'embeddings'
+# Session label of requests no session matched.
+UNMATCHED = 'none'
+# Status of streams closed by the client or cancelled before their last chunk, as nginx logs them.
+ABORTED = 499
+
 
 class Monitor:
+    # Whether on_stream_chunk is called, streams only report their start and end otherwise.
+    chunk_events = False
+    # Whether request timings keep every span of their phases, rather than only the total per phase.
+    timing_spans = False
+
     def on_server_start(self, server):
         pass
 
@@ -25,15 +45,102 @@ class Monitor:
     async def on_session_end(self, response):
         pass
 
+    async def on_stream_start(self, response):
+        pass
+
+    async def on_stream_chunk(self, frame: bytes):
+        pass
+
+    async def on_stream_end(self, response, chunks: int, size: int, duration: float):
+        pass
+
+    async def on_request_timing(self, timing: RequestTiming):
+        pass
+
+
+class CompositeMonitor(Monitor):
+    """Forwards every event to each of the given monitors in turn."""
+
+    def __init__(self, *monitors: Monitor):
+        self.monitors = monitors
+        self.chunk_events = any(monitor.chunk_events for monitor in monitors)
+        self.timing_spans = any(monitor.timing_spans for monitor in monitors)
+
+    def on_server_start(self, server):
+        for monitor in self.monitors:
+            monitor.on_server_start(server)
+
+    def on_server_end(self, server, elapsed):
+        for monitor in self.monitors:
+            monitor.on_server_end(server, elapsed)
+
+    async def on_session_start(self, request):
+        for monitor in self.monitors:
+            await monitor.on_session_start(request)
+
+    async def on_session_end(self, response):
+        for monitor in self.monitors:
+            await monitor.on_session_end(response)
+
+    async def on_stream_start(self, response):
+        for monitor in self.monitors:
+            await monitor.on_stream_start(response)
+
+    async def on_stream_chunk(self, frame: bytes):
+        for monitor in self.monitors:
+            if monitor.chunk_events:
+                await monitor.on_stream_chunk(frame)
+
+    async def on_stream_end(self, response, chunks: int, size: int, duration: float):
+        for monitor in self.monitors:
+            await monitor.on_stream_end(response, chunks, size, duration)
+
+    async def on_request_timing(self, timing: RequestTiming):
+        for monitor in self.monitors:
+            await monitor.on_request_timing(timing)
+
 
 class SessionSettingMixin:
     def match(self, request: Request) -> bool:
         return self._matcher.match(request)
 
+    def prepare(self, position):
+        self.label = str(position)
+        self.match = self._matcher.compile()
+        self.templates = {}
+        return self
+
     def write_response(self, context: SessionContext):
         self._handler.write_response(context)
 
 
+class BatchSession:
+    """Answers a batch of embeddings inputs, each with the session which matched it."""
+
+    def __init__(self, items: list, sessions: list):
+        self.items = items
+        self.sessions = sessions
+        # Requests are counted under the session of their first input.
+        self.label = sessions[0].label
+
+    def write_response(self, context: SessionContext):
+        response = context.response
+        delay = 0.0
+        for item, session in zip(self.items, self.sessions):
+            response.delay = 0.0
+            # An input whose session configures no vector is answered with null, as a single input is.
+            response.embedding = None
+            session.write_response(SessionContext(item, response))
+            # Inputs are embedded together, so the batch waits as long as its slowest input.
+            delay = max(delay, response.delay)
+            if not response.is_success():
+                break
+
+            response.data.append(response.embedding)
+
+        response.delay = delay
+
+
 def extend_instance(obj, module):
     for key, value in module.__dict__.items():
         if callable(value):
@@ -43,145 +150,332 @@ def extend_instance(obj, module):
 
 
 class ActualGptServer(GptServer):
-    def __init__(self, port, monitor: Monitor = Monitor()):
-        completions = Completions()
+    def __init__(self, port, monitor: Monitor = Monitor(), combine_regex=False, tokens_per_second=None,
+                 host='0.0.0.0', backlog=128, reuse_port=None, loop=None, expose_metrics=False, metrics_file=None,
+                 journal_capacity=DEFAULT_JOURNAL_CAPACITY, journal_eviction='oldest'):
+        new_journal = partial(RequestJournal, journal_capacity, journal_eviction)
+        completions = Completions(new_journal)
         chat = Chat(completions)
-        embeddings = Embeddings()
+        embeddings = Embeddings(new_journal)
         super().__init__(chat, embeddings)
         self.runner = None
         self.thread = None
+        self.started = threading.Event()
+        self.started_at = None
         self.loop = None
+        self.loop_factory = loop_factory(loop)
         self.sessions = []
         self.port = port
+        self.host = host
+        self.backlog = backlog
+        self.reuse_port = reuse_port
         self.monitor = monitor
+        self.combine_regex = combine_regex
+        self.tokens_per_second = tokens_per_second or {}
+        self.timer = None
+        self.completions_dispatcher = None
+        self.embeddings_dispatcher = None
+        self.metrics = Metrics()
+        self.timing_spans = monitor.timing_spans
+        self.expose_metrics = expose_metrics
+        self.metrics_file = metrics_file
 
     def _before_start(self):
-        self.chat.completions.sessions = [extend_instance(session, SessionSettingMixin)
-                                          for session in self.chat.completions.sessions]
-        self.embeddings.sessions = [extend_instance(session, SessionSettingMixin)
-                                    for session in self.embeddings.sessions]
+        self.chat.completions.sessions = [extend_instance(session, SessionSettingMixin).prepare(position)
+                                          for position, session in enumerate(self.chat.completions.sessions)]
+        self.embeddings.sessions = [extend_instance(session, SessionSettingMixin).prepare(position)
+                                    for position, session in enumerate(self.embeddings.sessions)]
+        self.completions_dispatcher = SessionDispatcher(self.chat.completions.sessions, self.combine_regex)
+        self.embeddings_dispatcher = SessionDispatcher(self.embeddings.sessions, self.combine_regex)
 
     def __enter__(self):
         self.thread = threading.Thread(target=self.start_server)
         self.thread.start()
+        self.started.wait()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         stop_future = asyncio.run_coroutine_threadsafe(self._stop(), self.loop)
         stop_future.result()
+        self.monitor.on_server_end(self, int(time.time() - self.started_at))
         self.loop.call_soon_threadsafe(self.loop.stop)
         self.thread.join()
 
     def start_server(self):
-        self._before_start()
-        self.loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(self.loop)
-        self.monitor.on_server_start(self)
-        self.loop.run_until_complete(self._start())
+        self.started_at = time.time()
+        try:
+            self._before_start()
+            self.loop = self.loop_factory()
+            asyncio.set_event_loop(self.loop)
+            self.monitor.on_server_start(self)
+            self.loop.run_until_complete(self._start())
+        finally:
+            self.started.set()
+
         self.loop.run_forever()
 
     def stop_server(self, elapsed):
-        asyncio.run_coroutine_threadsafe(self._stop(), self.loop)
-        self.loop.call_soon_threadsafe(self.loop.stop)
-        self.monitor.on_server_end(self, elapsed)
+        # Stop the loop only once the site is closed, so no connection is cut mid-response.
+        def on_stopped(_):
+            self.monitor.on_server_end(self, elapsed)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+        stop_future = asyncio.run_coroutine_threadsafe(self._stop(), self.loop)
+        stop_future.add_done_callback(on_stopped)
 
     async def _start(self):
+        self.timer = TimerWheel(asyncio.get_running_loop())
         app = web.Application()
         app.router.add_post('/v1/chat/completions', self.chat_completions_api)
         app.router.add_post('/v1/embeddings', self.embeddings_api)
+        if self.expose_metrics:
+            app.router.add_get('/metrics', self.metrics_api)
 
         self.runner = web.AppRunner(app)
         await self.runner.setup()
-        site = web.TCPSite(self.runner, '0.0.0.0', self.port)
+        site = web.TCPSite(self.runner, self.host, self.port, backlog=self.backlog, reuse_port=self.reuse_port)
         await site.start()
 
         return self.runner
 
     async def _stop(self):
         await self.runner.cleanup()
+        self.timer.close()
+        if self.metrics_file is not None:
+            self.metrics.dump(self.metrics_file)
+
+    async def metrics_api(self, request: web.Request):
+        return web.Response(body=self.metrics.render().encode(), headers={'Content-Type': CONTENT_TYPE})
 
     async def chat_completions_api(self, request: web.Request):
-        json_request = await request.json()
+        timing = RequestTiming(CHAT_COMPLETIONS, self.timing_spans)
+        json_request = await self._read_json(request, timing)
         await self.monitor.on_session_start(json_request)
+        timing.skip()
+
         chat_request = CompletionsRequest(request.headers, json_request)
         response = CompletionsResponse(chat_request.model, chat_request.prompt_tokens())
         context = SessionContext(chat_request, response)
+        timing.mark(REQUEST)
 
-        try:
-            matched_session = next(
-                (session for session in self.chat.completions.sessions if session.match(chat_request)), None)
-        except Exception:
-            return await self.default_response(request)
-
+        matched_session = self._dispatch(self.completions_dispatcher, self.chat.completions.requests, chat_request,
+                                         timing)
         if matched_session is None:
-            return await self.default_response(request)
+            return await self.default_response(request, timing)
 
         matched_session.write_response(context)
+        timing.mark(HANDLER)
+        if context.response.delay:
+            await self.timer.sleep(context.response.delay)
+            timing.mark(DELAY)
+
         if not context.response.is_success():
-            return await self.error_response(request, context)
+            return await self.error_response(request, context, timing, matched_session)
 
         if chat_request.stream:
-            return await self.stream_response(context, request)
+            return await self.stream_response(context, request, matched_session, timing)
 
-        response = web.json_response(context.response.to_dict())
+        response = web.Response(body=context.response.to_json(matched_session.templates),
+                                content_type='application/json', charset='utf-8')
+        timing.mark(SERIALIZE)
         await self.monitor.on_session_end(response.text)
-        return response
+        timing.skip()
+        return await self._write(request, response, timing, matched_session)
 
     async def embeddings_api(self, request: web.Request):
-        json_request = await request.json()
+        timing = RequestTiming(EMBEDDINGS, self.timing_spans)
+        json_request = await self._read_json(request, timing)
+        await self.monitor.on_session_start(json_request)
+        timing.skip()
+
         embeddings_request = EmbeddingsRequest(request.headers, json_request)
         embeddings_response = EmbeddingsResponse(embeddings_request.model)
-
         context = SessionContext(embeddings_request, embeddings_response)
-
-        try:
-            matched_session = next(
-                (session for session in self.embeddings.sessions if session.match(embeddings_request)), None)
-        except Exception:
-            return await self.default_response(request)
-
+        timing.mark(REQUEST)
+
+        if embeddings_request.is_batch():
+            matched_session = self._dispatch_batch(self.embeddings_dispatcher, self.embeddings.requests,
+                                                   embeddings_request, timing)
+        else:
+            matched_session = self._dispatch(self.embeddings_dispatcher, self.embeddings.requests,
+                                             embeddings_request, timing)
         if matched_session is None:
-            return await self.default_response(request)
+            return await self.default_response(request, timing)
 
         matched_session.write_response(context)
+        timing.mark(HANDLER)
+        if context.response.delay:
+            await self.timer.sleep(context.response.delay)
+            timing.mark(DELAY)
+
         if not context.response.is_success():
-            return await self.error_response(request, context)
+            return await self.error_response(request, context, timing, matched_session)
 
-        response = web.json_response(context.response.to_embeddings())
+        response = web.Response(body=context.response.to_json(embeddings_request.encoding_format),
+                                content_type='application/json', charset='utf-8')
+        timing.mark(SERIALIZE)
         await self.monitor.on_session_end(response.text)
+        timing.skip()
+        return await self._write(request, response, timing, matched_session)
+
+    @staticmethod
+    async def _read_json(request: web.Request, timing: RequestTiming):
+        body = await request.read()
+        timing.mark(READ)
+        json_request = json.loads(body)
+        timing.mark(DECODE)
+        return json_request
+
+    @staticmethod
+    def _dispatch(dispatcher: SessionDispatcher, journal: RequestJournal, request: Request, timing: RequestTiming):
+        journal.record(request)
+        try:
+            session = dispatcher.dispatch(request)
+        except Exception:
+            session = None
+
+        if session is not None:
+            session.requests.record(request)
+
+        timing.mark(MATCH)
+        return session
+
+    @staticmethod
+    def _dispatch_batch(dispatcher: SessionDispatcher, journal: RequestJournal, request: EmbeddingsRequest,
+                        timing: RequestTiming):
+        """Dispatches a batch as a whole first, then every input on its own, unmatched if any input is."""
+        journal.record(request)
+        try:
+            session = dispatcher.dispatch(request)
+        except Exception:
+            session = None
+
+        # A session expecting the whole list of inputs answers it, as it did before inputs were split.
+        if session is not None:
+            session.requests.record(request)
+            timing.mark(MATCH)
+            return session
+
+        items = request.items()
+        sessions = []
+        # Inputs differ only in their text, so a text repeated within the batch matches the same session.
+        matched = {}
+        try:
+            for item in items:
+                key = item.input if isinstance(item.input, str) else tuple(item.input)
+                session = matched.get(key)
+                if session is None:
+                    session = matched[key] = dispatcher.dispatch(item)
+                if session is None:
+                    break
+
+                sessions.append(session)
+        except Exception:
+            sessions = []
+
+        matched_all = len(sessions) == len(items)
+        if matched_all:
+            for item, session in zip(items, sessions):
+                session.requests.record(item)
+
+        timing.mark(MATCH)
+        return BatchSession(items, sessions) if matched_all else None
+
+    async def _write(self, request, response: web.Response, timing: RequestTiming, session):
+        await response.prepare(request)
+        await response.write_eof()
+        timing.mark(WRITE)
+        await self._finish(timing, session.label, response.status, len(response.body))
         return response
 
-    async def stream_response(self, context, request):
-        resp = EventSourceResponse()
-        await resp.prepare(request)
-        async with resp:
-            async for data in context.response.sse_content():
-                await self.monitor.on_session_end(data)
-                await resp.send(json.dumps(data))
+    async def _finish(self, timing: RequestTiming, session: str, status: int, size: int = 0):
+        timing.finish(session, status, size)
+        endpoint = (timing.endpoint,)
+        durations = timing.durations
+        metrics = self.metrics
+
+        metrics.requests.inc((timing.endpoint, session, status))
+        if MATCH in durations:
+            metrics.match_seconds.observe(endpoint, durations[MATCH])
+        if HANDLER in durations:
+            metrics.render_seconds.observe(endpoint, durations[HANDLER] + durations.get(SERIALIZE, 0.0))
+        if WRITE in durations:
+            metrics.write_seconds.observe(endpoint, durations[WRITE])
+            metrics.bytes_written.inc(endpoint, size)
+
+        await self.monitor.on_request_timing(timing)
+
+    async def stream_response(self, context, request, session, timing: RequestTiming):
+        response = context.response
+        tokens_per_second = response.tokens_per_second or self.tokens_per_second.get(response.model)
+        interval = 1 / tokens_per_second if tokens_per_second else 0
+        # Unpaced streams write their chunks back to back, without waiting on the timer.
+        paced = interval > 0 or response.inter_token_delay is not None
+
+        chunk_events = self.monitor.chunk_events
+        chunks, written = 0, 0
+        stream_started = time.perf_counter()
+        completed = False
+
+        self.metrics.streams_in_flight.inc()
+        await self.monitor.on_stream_start(response)
+        try:
+            resp = EventSourceResponse()
+            await resp.prepare(request)
+            async with resp:
+                timing.mark(WRITE)
+                if response.first_token_delay is not None:
+                    await self.timer.sleep(response.first_token_delay.sample())
+                    timing.mark(DELAY)
+
+                deadline = None
+                for frame in response.sse_frames(session.templates):
+                    timing.mark(SERIALIZE)
+                    if paced and deadline is None:
+                        deadline = self.timer.time()
+                    elif paced:
+                        gap = interval
+                        if response.inter_token_delay is not None:
+                            gap += response.inter_token_delay.sample()
+                        # Deadlines keep the rate steady, but a stream which fell behind does not burst.
+                        deadline = max(deadline + gap, self.timer.time())
+                        await self.timer.sleep_until(deadline)
+                        timing.mark(DELAY)
+
+                    if chunk_events:
+                        await self.monitor.on_stream_chunk(frame)
+                        timing.skip()
+                    await resp.send_frame(frame)
+                    timing.mark(WRITE)
+                    written += len(frame)
+                    chunks += 1
+            completed = True
+        finally:
+            await self.monitor.on_stream_end(response, chunks, written, time.perf_counter() - stream_started)
+            self.metrics.streams_in_flight.dec()
+            if completed:
+                await self._finish(timing, session.label, 200, written)
+            else:
+                # An aborted stream is only counted, its phases do not time a complete response.
+                self.metrics.requests.inc((timing.endpoint, session.label, ABORTED))
+
         return resp
 
-    async def default_response(self, request):
+    async def default_response(self, request, timing: RequestTiming):
+        self.metrics.unmatched.inc((timing.endpoint,))
         response = web.Response(status=400, text="Bad Request")
         await response.prepare(request)
+        await self._finish(timing, UNMATCHED, 400)
         return response
 
-    async def error_response(self, request, context: SessionContext):
+    async def error_response(self, request, context: SessionContext, timing: RequestTiming, session):
         status = context.response.status
         if context.response.redirect is not None:
             response = web.Response(status=status, headers={'Location': context.response.redirect.location})
-            await response.prepare(request)
-            return response
-
-        result = json.dumps(
-            {
-                'error':
-                    {
-                        'message': context.response.api_error.message,
-                        'type': context.response.api_error.type
-                    }
-            }
-        )
-        response = web.Response(status=status, text=result)
+        else:
+            response = web.Response(status=status, body=context.response.api_error.body,
+                                    content_type='text/plain', charset='utf-8')
+
         await response.prepare(request)
+        await self._finish(timing, session.label, status)
         return response
-
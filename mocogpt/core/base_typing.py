@@ -1,11 +1,17 @@
+import bisect
+import json
+import random
 import re
-import time
 from abc import ABC, abstractmethod
+from collections.abc import Callable
 from enum import Enum, unique
 from functools import partial
 from inspect import Parameter, Signature
+from operator import attrgetter
 from typing import Generic, TypeVar
 
+from mocogpt.core._journal import RequestJournal
+
 
 @unique
 class UnaryOperatorType(Enum):
@@ -32,9 +38,40 @@ class UnaryOperator:
         self.type = _type
         self.arg = arg
 
+    compilers = {
+        UnaryOperatorType.EQUALS: lambda extract, arg: lambda request: extract(request) == arg,
+        UnaryOperatorType.CONTAINS: lambda extract, arg: lambda request: arg in extract(request),
+        UnaryOperatorType.STARTSWITH: lambda extract, arg: lambda request: extract(request).startswith(arg),
+        UnaryOperatorType.ENDSWITH: lambda extract, arg: lambda request: extract(request).endswith(arg),
+    }
+
     def match(self, value):
         return UnaryOperator.operators[self.type](value, self.arg)
 
+    def compile(self, extract):
+        return UnaryOperator.compilers[self.type](extract, self.arg)
+
+
+class RegexOperator(UnaryOperator):
+    modes = ('match', 'fullmatch', 'search')
+
+    def __init__(self, pattern, flags=0, mode='match'):
+        if mode not in RegexOperator.modes:
+            raise ValueError(f"Unknown regex mode {mode}")
+
+        super().__init__(UnaryOperatorType.REGEX, pattern)
+        self.flags = flags
+        self.mode = mode
+        self.pattern = re.compile(pattern, flags)
+        self._match = getattr(self.pattern, mode)
+
+    def match(self, value):
+        return self._match(value) is not None
+
+    def compile(self, extract):
+        match = self._match
+        return lambda request: match(extract(request)) is not None
+
 
 @unique
 class VarargOperatorType(Enum):
@@ -57,6 +94,50 @@ class VarargOperator:
     def match(self, matchers, value):
         return VarargOperator.operators[self.type](value, matchers)
 
+    def compile(self, matchers: list):
+        if self.type == VarargOperatorType.ALL_OF:
+            return compile_all_of(matchers)
+
+        if self.type == VarargOperatorType.ANY_OF:
+            return compile_any_of(matchers)
+
+        match_any = compile_any_of(matchers)
+        return lambda request: not match_any(request)
+
+
+def compile_all_of(matchers: list):
+    if len(matchers) == 1:
+        return matchers[0]
+
+    if len(matchers) == 2:
+        first, second = matchers
+        return lambda request: first(request) and second(request)
+
+    def match_all(request):
+        for matcher in matchers:
+            if not matcher(request):
+                return False
+        return True
+
+    return match_all
+
+
+def compile_any_of(matchers: list):
+    if len(matchers) == 1:
+        return matchers[0]
+
+    if len(matchers) == 2:
+        first, second = matchers
+        return lambda request: first(request) or second(request)
+
+    def match_any(request):
+        for matcher in matchers:
+            if matcher(request):
+                return True
+        return False
+
+    return match_any
+
 
 def any_of(*args):
     return VarargOperator(VarargOperatorType.ANY_OF, *args)
@@ -82,8 +163,8 @@ def endswith(arg):
     return UnaryOperator(UnaryOperatorType.ENDSWITH, arg)
 
 
-def regex(arg):
-    return UnaryOperator(UnaryOperatorType.REGEX, arg)
+def regex(arg, flags=0, mode='match'):
+    return RegexOperator(arg, flags, mode)
 
 
 class RequestMeta(type):
@@ -123,6 +204,14 @@ class APIError:
         self.status = status
         self.message = message
         self.type = _type
+        self._body = None
+
+    @property
+    def body(self) -> bytes:
+        if self._body is None:
+            self._body = json.dumps({'error': {'message': self.message, 'type': self.type}}).encode()
+
+        return self._body
 
 
 class Redirect:
@@ -156,6 +245,95 @@ def redirect(status, location):
     return Redirect(status, location)
 
 
+class Latency(ABC):
+    @abstractmethod
+    def sample(self) -> float:
+        pass
+
+
+class FixedLatency(Latency):
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def sample(self) -> float:
+        return self.seconds
+
+
+class UniformLatency(Latency):
+    def __init__(self, low, high):
+        self.low = low
+        self.high = high
+
+    def sample(self) -> float:
+        return random.uniform(self.low, self.high)
+
+
+class NormalLatency(Latency):
+    def __init__(self, mean, stddev):
+        self.mean = mean
+        self.stddev = stddev
+
+    def sample(self) -> float:
+        return max(0.0, random.gauss(self.mean, self.stddev))
+
+
+class PercentileLatency(Latency):
+    """Samples latencies from a percentile table such as ``{50: 0.2, 90: 0.5, 99: 1.2}``.
+
+    Latencies between two percentiles are interpolated linearly, while those below the lowest
+    or above the highest percentile are clamped to its latency.
+    """
+
+    def __init__(self, table: dict):
+        if not table:
+            raise ValueError('No percentiles specified')
+
+        points = sorted(table.items())
+        if points[0][0] <= 0 or points[-1][0] > 100:
+            raise ValueError('Percentiles must be within (0, 100]')
+
+        self.quantiles = [quantile for quantile, _ in points]
+        self.latencies = [latency for _, latency in points]
+
+    def sample(self) -> float:
+        quantile = random.uniform(0, 100)
+        index = bisect.bisect_left(self.quantiles, quantile)
+        if index == 0:
+            return self.latencies[0]
+        if index == len(self.quantiles):
+            return self.latencies[-1]
+
+        low, high = self.quantiles[index - 1], self.quantiles[index]
+        ratio = (quantile - low) / (high - low)
+        return self.latencies[index - 1] + ratio * (self.latencies[index] - self.latencies[index - 1])
+
+
+def uniform(low, high):
+    return UniformLatency(low, high)
+
+
+def normal(mean, stddev):
+    return NormalLatency(mean, stddev)
+
+
+def percentiles(**kwargs):
+    """Creates a latency from keywords such as ``p50=0.2, p90=0.5, p99=1.2`` or ``p99_9=2.0``."""
+    table = {}
+    for name, latency in kwargs.items():
+        if not re.fullmatch(r'p\d+(_\d+)?', name):
+            raise TypeError(f"Unknown percentile {name}")
+        table[float(name[1:].replace('_', '.'))] = latency
+
+    return PercentileLatency(table)
+
+
+def as_latency(value) -> Latency:
+    if isinstance(value, Latency):
+        return value
+
+    return FixedLatency(value)
+
+
 class Response(ABC):
     def __init__(self, model):
         self._model = model
@@ -163,6 +341,7 @@ class Response(ABC):
         self._status = 200
         self._api_error = None
         self._redirect = None
+        self.delay = 0.0
 
     def is_success(self):
         return self._status == 200
@@ -199,6 +378,10 @@ class SessionContext(Generic[T, R]):
         self._request = request
         self._response = response
 
+    @property
+    def request(self) -> T:
+        return self._request
+
     @property
     def response(self) -> R:
         return self._response
@@ -209,6 +392,9 @@ class RequestMatcher(Generic[T], ABC):
     def match(self, request: T) -> bool:
         pass
 
+    def compile(self) -> Callable[[T], bool]:
+        return self.match
+
 
 class AllOfMatcher(RequestMatcher):
     def __init__(self, matchers: list[RequestMatcher]):
@@ -217,12 +403,18 @@ class AllOfMatcher(RequestMatcher):
     def match(self, request: Request) -> bool:
         return all(matcher.match(request) for matcher in self.matchers)
 
+    def compile(self) -> Callable[[Request], bool]:
+        return compile_all_of([matcher.compile() for matcher in self.matchers])
+
 
 class RequestExtractor(Generic[T], ABC):
     @abstractmethod
     def extract(self, request: T) -> str:
         pass
 
+    def compile(self) -> Callable[[T], str]:
+        return self.extract
+
 
 class UnaryOperatorMatcher(RequestMatcher):
     def __init__(self, extractor: RequestExtractor, operator: UnaryOperator):
@@ -232,6 +424,9 @@ class UnaryOperatorMatcher(RequestMatcher):
     def match(self, request: Request) -> bool:
         return self.operator.match(self.extractor.extract(request))
 
+    def compile(self) -> Callable[[Request], bool]:
+        return self.operator.compile(self.extractor.compile())
+
 
 class VarargOperatorMatcher(RequestMatcher):
     def __init__(self, matchers: list[RequestMatcher], operator: VarargOperator):
@@ -241,6 +436,9 @@ class VarargOperatorMatcher(RequestMatcher):
     def match(self, request: Request) -> bool:
         return self.operator.match(self.matchers, request)
 
+    def compile(self) -> Callable[[Request], bool]:
+        return self.operator.compile([matcher.compile() for matcher in self.matchers])
+
 
 class ResponseHandler(Generic[R], ABC):
     @abstractmethod
@@ -250,10 +448,10 @@ class ResponseHandler(Generic[R], ABC):
 
 class SleepResponseHandler(ResponseHandler):
     def __init__(self, seconds):
-        self.seconds = seconds
+        self.latency = as_latency(seconds)
 
     def write_response(self, context: SessionContext):
-        time.sleep(self.seconds)
+        context.response.delay += self.latency.sample()
 
 
 class AllOfHandler(ResponseHandler):
@@ -290,11 +488,14 @@ def make_sig(*names) -> Signature:
 class SessionSetting:
     def __init__(self, matcher: RequestMatcher,
                  create_matcher,
-                 create_handler):
+                 create_handler,
+                 journal: RequestJournal = None):
         self._matcher = matcher
         self._handler = None
         self._create_handler = create_handler
         self._create_matcher = create_matcher
+        self.requests = journal if journal is not None else RequestJournal()
+        self.templates = {}
 
     def or_request(self, **kwargs):
         self._matcher = VarargOperatorMatcher(
@@ -304,6 +505,12 @@ class SessionSetting:
 
     def response(self, **kwargs):
         self._handler = self._create_handler(**kwargs)
+        # Templates of a running server hold what the previous handler replied.
+        self.templates = {}
+        return self
+
+    def verify(self, times=None, at_least=None, at_most=None):
+        self.requests.verify(times, at_least, at_most)
 
 
 class Endpoint:
@@ -318,8 +525,10 @@ class Endpoint:
     _request_params = []
     _response_params = {}
 
-    def __init__(self):
+    def __init__(self, new_journal=RequestJournal):
         self.sessions = []
+        self._new_journal = new_journal
+        self.requests = new_journal()
         self._create_matchers = partial(self._actual_create_matchers)
 
         self._actual_response_params = {
@@ -333,7 +542,7 @@ class Endpoint:
 
     def request(self, **kwargs) -> SessionSetting:
         matcher = self._create_matchers(**kwargs)
-        session = SessionSetting(matcher, self._create_matchers, self._create_handlers)
+        session = SessionSetting(matcher, self._create_matchers, self._create_handlers, self._new_journal())
         self.sessions.append(session)
         return session
 
@@ -406,7 +615,9 @@ def extractor_class(name):
         return extractors[name]
 
     clazz = type(to_class_name(name) + 'Extractor', (RequestExtractor,), {
-        'extract': lambda self, request: getattr(request, name.lower())
+        'name': name.lower(),
+        'extract': lambda self, request: getattr(request, name.lower()),
+        'compile': lambda self: attrgetter(name.lower())
     })
 
     extractors[name] = clazz
@@ -1,19 +1,22 @@
 import hashlib
 import time
 
-import tiktoken
-
+from mocogpt.core._template import JsonTemplate, Placeholder, encode_value
+from mocogpt.core._tokenizer import tokenizer
 from mocogpt.core.base_typing import (
     Endpoint,
     Request,
     Response,
     ResponseHandler,
     SessionContext,
+    as_latency,
 )
 
+MAX_TEMPLATES_PER_SESSION = 64
+
 
 def count_tokens(model: str, content: str) -> int:
-    return len(tiktoken.encoding_for_model(model).encode(content))
+    return tokenizer.count(model, content)
 
 
 class CompletionsRequest(Request):
@@ -26,7 +29,7 @@ class CompletionsRequest(Request):
         return self._content['messages'][-1]['content']
 
     def prompt_tokens(self):
-        return sum(count_tokens(self.model, content['content']) for content in self._content['messages'])
+        return tokenizer.count_messages(self.model, [message['content'] for message in self._content['messages']])
 
     @property
     def stream(self) -> bool:
@@ -41,9 +44,42 @@ def generate_unique_id():
 
 
 def split_content(model, content):
-    encoding = tiktoken.encoding_for_model(model)
-    result = encoding.encode(content)
-    return [encoding.decode_single_token_bytes(token).decode("utf-8") for token in result]
+    return tokenizer.split(model, content)
+
+
+class TokenizedContent(str):
+    """Response content which keeps its token count and streaming chunks per encoding."""
+
+    def __new__(cls, content: str):
+        tokenized = super().__new__(cls, content)
+        tokenized._tokens = {}
+        tokenized._parts = {}
+        tokenized._encoded_parts = {}
+        return tokenized
+
+    def tokens(self, model) -> int:
+        name = tokenizer.encoding(model).name
+        tokens = self._tokens.get(name)
+        if tokens is None:
+            tokens = self._tokens[name] = count_tokens(model, str(self))
+
+        return tokens
+
+    def parts(self, model) -> list[str]:
+        name = tokenizer.encoding(model).name
+        parts = self._parts.get(name)
+        if parts is None:
+            parts = self._parts[name] = split_content(model, str(self))
+
+        return parts
+
+    def encoded_parts(self, model) -> list[bytes]:
+        name = tokenizer.encoding(model).name
+        encoded_parts = self._encoded_parts.get(name)
+        if encoded_parts is None:
+            encoded_parts = self._encoded_parts[name] = [encode_value(part) for part in self.parts(model)]
+
+        return encoded_parts
 
 
 class CompletionsResponse(Response):
@@ -54,25 +90,45 @@ class CompletionsResponse(Response):
         self.finish_reason = "stop"
         self.system_fingerprint = None
         self.logprobs = None
+        self.first_token_delay = None
+        self.inter_token_delay = None
+        self.tokens_per_second = None
 
     def to_dict(self):
         completion_tokens = self.completion_tokens()
 
+        return self._to_dict(self._id, int(time.time()), self.prompt_tokens, completion_tokens,
+                             self.prompt_tokens + completion_tokens)
+
+    def to_json(self, templates: dict) -> bytes:
+        completion_tokens = self.completion_tokens()
+        template = templates.get(self._model)
+        if template is None:
+            template = JsonTemplate(self._to_dict(Placeholder('id'), Placeholder('created'),
+                                                  Placeholder('prompt_tokens'), completion_tokens,
+                                                  Placeholder('total_tokens')))
+            if len(templates) < MAX_TEMPLATES_PER_SESSION:
+                templates[self._model] = template
+
+        return template.render(id=self._id, created=int(time.time()), prompt_tokens=self.prompt_tokens,
+                               total_tokens=self.prompt_tokens + completion_tokens)
+
+    def _to_dict(self, _id, created, prompt_tokens, completion_tokens, total_tokens):
         return {
-            'id': self._id,
-            'created': int(time.time()),
+            'id': _id,
+            'created': created,
             'model': self._model,
             'choices': self._choices(),
             'system_fingerprint': self.system_fingerprint,
             'usage': {
-                "prompt_tokens": self.prompt_tokens,
+                "prompt_tokens": prompt_tokens,
                 "completion_tokens": completion_tokens,
-                "total_tokens": self.prompt_tokens + completion_tokens
+                "total_tokens": total_tokens
             }
         }
 
     def completion_tokens(self) -> int:
-        return sum(count_tokens(self.model, content) for content in self._content)
+        return sum(content.tokens(self._model) for content in self._content)
 
     def _choices(self):
         choices = []
@@ -88,6 +144,10 @@ class CompletionsResponse(Response):
             })
         return choices
 
+    @property
+    def id(self):
+        return self._id
+
     @property
     def model(self):
         return self._model
@@ -98,36 +158,62 @@ class CompletionsResponse(Response):
 
     @content.setter
     def content(self, content):
-        self._content.append(content)
+        self._content.append(content if isinstance(content, TokenizedContent) else TokenizedContent(content))
 
     async def sse_content(self):
         created = int(time.time())
-        for content in self._content:
-            parts = split_content(self._model, content)
-            for data in parts:
-                yield {
-                    "id": self._id,
-                    "object": "chat.completion.chunk",
-                    "created": created,
-                    "model": self._model,
-                    "system_fingerprint": self.system_fingerprint,
-                    "choices": [
-                        {
-                            "index": 0,
-                            "delta": {
-                                "content": data
-                            },
-                            "logprobs": None,
-                            "finish_reason": self.finish_reason if data == parts[-1] and content == self._content[
-                                -1] else None
-                        }
-                    ]
+        for data, finish_reason in self._sse_parts(lambda content: content.parts(self._model)):
+            yield self._chunk(self._id, created, data, finish_reason)
+
+    def sse_frames(self, templates: dict):
+        key = (self._model, 'chunk')
+        template = templates.get(key)
+        if template is None:
+            template = JsonTemplate(self._chunk(Placeholder('id'), Placeholder('created'),
+                                                Placeholder('content'), Placeholder('finish_reason')))
+            if len(templates) < MAX_TEMPLATES_PER_SESSION:
+                templates[key] = template
+
+        head, middle, tail = template.segments(id=self._id, created=int(time.time()))
+        head = b'data: ' + head
+        tail = tail + b'\r\n\r\n'
+        finish_reasons = {None: b'null', self.finish_reason: encode_value(self.finish_reason)}
+
+        for data, finish_reason in self._sse_parts(lambda content: content.encoded_parts(self._model)):
+            yield b''.join((head, data, middle, finish_reasons[finish_reason], tail))
+
+    def _sse_parts(self, parts_of):
+        last = len(self._content) - 1
+        for index, content in enumerate(self._content):
+            parts = parts_of(content)
+            for data in parts[:-1]:
+                yield data, None
+            if parts:
+                yield parts[-1], self.finish_reason if index == last else None
+
+    def _chunk(self, _id, created, data, finish_reason):
+        return {
+            "id": _id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": self._model,
+            "system_fingerprint": self.system_fingerprint,
+            "choices": [
+                {
+                    "index": 0,
+                    "delta": {
+                        "content": data
+                    },
+                    "logprobs": None,
+                    "finish_reason": finish_reason
                 }
+            ]
+        }
 
 
 class ContentResponseHandler(ResponseHandler[CompletionsResponse]):
     def __init__(self, content: str):
-        self.content = content
+        self.content = TokenizedContent(content)
 
     def write_response(self, context: SessionContext):
         context.response.content = self.content
@@ -157,6 +243,30 @@ class LogprobResponseHandler(ResponseHandler[CompletionsResponse]):
         context.response.logprobs = self.logprobs
 
 
+class FirstTokenDelayResponseHandler(ResponseHandler[CompletionsResponse]):
+    def __init__(self, seconds):
+        self.latency = as_latency(seconds)
+
+    def write_response(self, context: SessionContext):
+        context.response.first_token_delay = self.latency
+
+
+class InterTokenDelayResponseHandler(ResponseHandler[CompletionsResponse]):
+    def __init__(self, seconds):
+        self.latency = as_latency(seconds)
+
+    def write_response(self, context: SessionContext):
+        context.response.inter_token_delay = self.latency
+
+
+class TokensPerSecondResponseHandler(ResponseHandler[CompletionsResponse]):
+    def __init__(self, tokens_per_second):
+        self.tokens_per_second = tokens_per_second
+
+    def write_response(self, context: SessionContext):
+        context.response.tokens_per_second = self.tokens_per_second
+
+
 class Completions(Endpoint):
     _request_params = [
         'model',
@@ -183,7 +293,10 @@ class Completions(Endpoint):
         'content': ContentResponseHandler,
         'finish_reason': FinishResponseHandler,
         'system_fingerprint': SystemFingerprintResponseHandler,
-        'logprob': LogprobResponseHandler
+        'logprob': LogprobResponseHandler,
+        'first_token_delay': FirstTokenDelayResponseHandler,
+        'inter_token_delay': InterTokenDelayResponseHandler,
+        'tokens_per_second': TokensPerSecondResponseHandler
     }
 
 
@@ -1,49 +1,259 @@
+import json
+from abc import ABC, abstractmethod
+from collections import Counter
+from functools import lru_cache
+
+from mocogpt.core._fixture import VectorFile, load_rows
+from mocogpt.core._template import encode_value
+from mocogpt.core._vector import Vector, as_vector, hashed_unit_vector, hashed_words, intern_vector, normalize
 from mocogpt.core.base_typing import (
     Endpoint,
     Request,
     Response,
     ResponseHandler,
     SessionContext,
+    bad_request,
 )
 
+# The envelope of to_embeddings as json.dumps writes it, with holes for the vectors and the model.
+EMBEDDING_JSON = b'{"object": "embedding", "embedding": %s, "index": %d}'
+EMBEDDINGS_JSON = b'{"object": "list", "data": [%s], "model": %s}'
+
 
 class EmbeddingsRequest(Request):
     _content_fields = ['input', 'encoding_format', 'dimensions', 'user']
 
+    def is_batch(self) -> bool:
+        # A list of token ids is a single input, while a list of strings or token lists is a batch.
+        _input = self._content.get('input')
+        return isinstance(_input, list) and len(_input) > 0 and not isinstance(_input[0], int)
+
+    def items(self) -> list['EmbeddingsItemRequest']:
+        return [EmbeddingsItemRequest(self, item) for item in self._content['input']]
+
+
+class EmbeddingsItemRequest(EmbeddingsRequest):
+    """One input of a batch, which reads as the request it belongs to otherwise."""
+
+    def __init__(self, batch: EmbeddingsRequest, item):
+        super().__init__(batch._headers, batch._content)
+        self._item = item
+
+    @property
+    def input(self):
+        return self._item
+
+    def is_batch(self) -> bool:
+        return False
+
 
 class EmbeddingsResponse(Response):
     def __init__(self, model: str):
         super().__init__(model)
         self._embedding = None
+        # Embeddings of a batch, in the order of its inputs.
+        self.data = []
 
     @property
-    def embedding(self):
+    def embedding(self) -> Vector | None:
         return self._embedding
 
     @embedding.setter
     def embedding(self, embedding):
-        self._embedding = embedding
+        self._embedding = as_vector(embedding) if embedding is not None else None
 
-    def to_embeddings(self):
+    def to_embeddings(self, encoding_format: str = None):
+        embeddings = self.data or [self.embedding]
         return {
             "object": "list",
             "data": [
                 {
                     "object": "embedding",
-                    "embedding": self.embedding,
-                    "index": 0
+                    "embedding": embedding.encode(encoding_format) if embedding is not None else None,
+                    "index": index
                 }
+                for index, embedding in enumerate(embeddings)
             ],
             "model": self._model
         }
 
+    def to_json(self, encoding_format: str = None) -> bytes:
+        """Serializes the response as ``to_embeddings`` would, splicing in the vectors serialized beforehand."""
+        embeddings = self.data or [self.embedding]
+        fragments = [embedding.fragment(encoding_format) if embedding is not None else b'null'
+                     for embedding in embeddings]
+        data = b', '.join(EMBEDDING_JSON % (fragment, index) for index, fragment in enumerate(fragments))
+        return EMBEDDINGS_JSON % (data, encode_value(self._model))
+
+
+DEFAULT_DIMENSIONS = 1536
+# The dimensions of the largest OpenAI embedding model, which bounds what a request may ask for.
+MAX_DIMENSIONS = 3072
+DEFAULT_CACHE_SIZE = 1024
+
+
+class EmbeddingGenerator(ABC):
+    """Computes the embedding of each request, rather than replying with a configured one."""
+
+    @abstractmethod
+    def generate(self, request: EmbeddingsRequest) -> Vector | None:
+        """Returns the embedding of the request, or None to reject it.
+
+        Raises ValueError, answered with its message, for a request which cannot be embedded.
+        """
+        pass
+
+
+def input_key(_input):
+    # Token ids are kept apart from text, so the string "[1, 2]" and the tokens [1, 2] differ.
+    if isinstance(_input, str):
+        return _input
+
+    if isinstance(_input, list):
+        return tuple(_input)
+
+    raise ValueError(f"Input must be a string or a list, got {type(_input).__name__}")
+
+
+class SyntheticEmbeddings(EmbeddingGenerator):
+    """Derives a stable unit vector from a hash of the input, the dimensions and the seed.
+
+    The requested ``dimensions`` win over the configured ones. The latest vectors are kept in
+    an LRU cache of ``cache_size`` entries, along with their encoded forms.
+    """
+
+    def __init__(self, dimensions=DEFAULT_DIMENSIONS, seed=0, cache_size=DEFAULT_CACHE_SIZE):
+        if dimensions <= 0:
+            raise ValueError(f"Dimensions must be positive, got {dimensions}")
+
+        self.dimensions = dimensions
+        self.seed = seed
+        self._vector = lru_cache(maxsize=cache_size)(self._generate)
+
+    def generate(self, request: EmbeddingsRequest) -> Vector:
+        dimensions = request.dimensions
+        if dimensions is None:
+            dimensions = self.dimensions
+        elif isinstance(dimensions, bool) or not isinstance(dimensions, int) or not 0 < dimensions <= MAX_DIMENSIONS:
+            raise ValueError(f"Dimensions must be an integer from 1 to {MAX_DIMENSIONS}, got {dimensions!r}")
+
+        return self._vector(input_key(request.input), dimensions)
+
+    def _generate(self, key, dimensions: int) -> Vector:
+        text = key if isinstance(key, str) else json.dumps(key)
+        return hashed_unit_vector(f"{self.seed}:{dimensions}:{text}".encode(), dimensions)
+
+
+def synthetic(dimensions=DEFAULT_DIMENSIONS, seed=0, cache_size=DEFAULT_CACHE_SIZE):
+    return SyntheticEmbeddings(dimensions, seed, cache_size)
+
+
+DEFAULT_NGRAM_SIZE = 3
+# Coordinates each n-gram is projected onto, and n-gram projections kept for reuse.
+NGRAM_NONZEROS = 8
+NGRAM_CACHE_SIZE = 65536
+
+
+def char_ngrams(text: str, n: int) -> list[str]:
+    padded = f" {text.lower()} "
+    return [padded[start:start + n] for start in range(len(padded) - n + 1)]
+
+
+class NgramEmbeddings(SyntheticEmbeddings):
+    """Projects the character n-grams of the input onto the dimensions, so similar texts get nearby vectors.
+
+    Each n-gram lands on a few hashed coordinates with hashed signs, a sparse random projection of the
+    n-gram counts, so the cosine of two vectors follows the n-grams their texts share. The same n-grams
+    recur across inputs, so their projections are cached. Token ids have no n-grams and get
+    ``synthetic`` vectors.
+    """
+
+    def __init__(self, dimensions=DEFAULT_DIMENSIONS, seed=0, n=DEFAULT_NGRAM_SIZE, cache_size=DEFAULT_CACHE_SIZE):
+        if n <= 0:
+            raise ValueError(f"N-gram size must be positive, got {n}")
+
+        super().__init__(dimensions, seed, cache_size)
+        self.n = n
+        self._projection = lru_cache(maxsize=NGRAM_CACHE_SIZE)(self._project)
+
+    def _generate(self, key, dimensions: int) -> Vector:
+        counts = Counter(char_ngrams(key, self.n)) if isinstance(key, str) else None
+        if not counts:
+            return super()._generate(key, dimensions)
+
+        components = [0.0] * dimensions
+        projection = self._projection
+        for ngram, count in counts.items():
+            for position, sign in projection(ngram, dimensions):
+                components[position] += sign * count
+
+        return normalize(components)
+
+    def _project(self, ngram: str, dimensions: int) -> tuple:
+        words = hashed_words(f"{self.seed}:{ngram}".encode(), NGRAM_NONZEROS)
+        return tuple((word % dimensions, -1.0 if word & 0x80000000 else 1.0) for word in words)
+
+
+def ngrams(dimensions=DEFAULT_DIMENSIONS, seed=0, n=DEFAULT_NGRAM_SIZE, cache_size=DEFAULT_CACHE_SIZE):
+    return NgramEmbeddings(dimensions, seed, n, cache_size)
+
+
+class FixtureEmbeddings(EmbeddingGenerator):
+    """Replies with vectors memory-mapped from a .npy or raw float32 file, at the row of each input.
+
+    ``rows`` is a file mapping inputs to rows, see ``load_rows``, or such a mapping itself. Inputs
+    without a row are rejected. Vectors read are kept in an LRU cache of ``cache_size`` entries.
+    """
+
+    def __init__(self, vectors: str, rows, dimensions=None, cache_size=DEFAULT_CACHE_SIZE):
+        self.vectors = VectorFile(vectors, dimensions)
+        self.rows = load_rows(rows) if isinstance(rows, str) else dict(rows)
+        for _input, row in self.rows.items():
+            if not 0 <= row < self.vectors.rows:
+                raise ValueError(f"Row {row} of {_input!r} is out of range of {self.vectors.rows} vectors")
+
+        self._vector = lru_cache(maxsize=cache_size)(self.vectors.vector)
+
+    def generate(self, request: EmbeddingsRequest) -> Vector | None:
+        _input = request.input
+        row = self.rows.get(_input) if isinstance(_input, str) else None
+        return self._vector(row) if row is not None else None
+
+
+def fixture(vectors: str, rows, dimensions=None, cache_size=DEFAULT_CACHE_SIZE):
+    return FixtureEmbeddings(vectors, rows, dimensions, cache_size)
+
 
 class EmbeddingsResponseHandler(ResponseHandler[EmbeddingsResponse]):
-    def __init__(self, embedding: list[float]):
-        self._embedding = embedding
+    def __init__(self, embedding: list[float] | Vector | EmbeddingGenerator):
+        if isinstance(embedding, EmbeddingGenerator):
+            self._generator = embedding
+            self._embedding = None
+        else:
+            self._generator = None
+            self._embedding = intern_vector(embedding)
 
     def write_response(self, context: SessionContext):
-        context.response.embedding = self._embedding
+        if self._generator is None:
+            context.response.embedding = self._embedding
+            return
+
+        request = context.request
+        # A batch matched as a whole is still embedded input by input.
+        batch = request.is_batch()
+        try:
+            embeddings = [self._generator.generate(item) for item in (request.items() if batch else [request])]
+        except ValueError as error:
+            context.response.api_error = bad_request(str(error), "invalid_request_error")
+            return
+
+        if any(embedding is None for embedding in embeddings):
+            context.response.api_error = bad_request("No embedding is configured for the input",
+                                                     "invalid_request_error")
+        elif batch:
+            context.response.data = embeddings
+        else:
+            context.response.embedding = embeddings[0]
 
 
 class Embeddings(Endpoint):
@@ -1,8 +1,27 @@
 import time
+from concurrent.futures import ThreadPoolExecutor
 
+import pytest
+import tiktoken
 from openai import OpenAI
 
-from mocogpt import gpt_server
+from mocogpt import any_of, gpt_server, normal, percentiles, uniform
+from mocogpt.core.actual_server import ActualGptServer, Monitor
+
+
+class StreamMonitor(Monitor):
+    def __init__(self, chunk_events=False):
+        self.chunk_events = chunk_events
+        self.events = []
+
+    async def on_stream_start(self, response):
+        self.events.append(('start', response.id))
+
+    async def on_stream_chunk(self, frame):
+        self.events.append(('chunk', frame))
+
+    async def on_stream_end(self, response, chunks, size, duration):
+        self.events.append(('end', response.id, chunks, size, duration))
 
 
 class TestChatCompletions:
@@ -415,6 +434,252 @@ class TestChatCompletions:
             assert response.usage.total_tokens >= 0
             assert response.choices[0].logprobs == -0.024693936
 
+    def test_should_count_prompt_tokens_for_growing_conversation(self, client: OpenAI):
+        server = gpt_server(12306)
+        server.chat.completions.request(prompt=any_of("Hi", "And you?")).response(content="How can I assist you?")
+        encoding = tiktoken.encoding_for_model("gpt-4")
+        messages = [{"role": "user", "content": "Hi"}]
+
+        with server:
+            response = client.chat.completions.create(model="gpt-4", messages=messages)
+
+            assert response.usage.prompt_tokens == len(encoding.encode("Hi"))
+
+            messages = messages + [
+                {"role": "assistant", "content": response.choices[0].message.content},
+                {"role": "user", "content": "And you?"}
+            ]
+            response = client.chat.completions.create(model="gpt-4", messages=messages)
+
+            assert response.usage.prompt_tokens == sum(len(encoding.encode(message["content"]))
+                                                       for message in messages)
+
+    def test_should_reply_same_completion_tokens_for_repeated_requests(self, client: OpenAI):
+        server = gpt_server(12306)
+        server.chat.completions.request(prompt="Hi").response(content="How can I assist you?")
+        encoding = tiktoken.encoding_for_model("gpt-4")
+
+        with server:
+            for _ in range(3):
+                response = client.chat.completions.create(
+                    model="gpt-4",
+                    messages=[{"role": "user", "content": "Hi"}]
+                )
+
+                assert response.usage.completion_tokens == len(encoding.encode("How can I assist you?"))
+
+                stream = client.chat.completions.create(
+                    model="gpt-4",
+                    messages=[{"role": "user", "content": "Hi"}],
+                    stream=True
+                )
+
+                assert "".join(chunk.choices[0].delta.content or "" for chunk in stream) == "How can I assist you?"
+
+    def test_should_reply_distinct_id_and_model_for_same_session(self, client: OpenAI):
+        server = gpt_server(12306)
+        server.chat.completions.request(prompt="Hi").response(content="How can I assist you?")
+
+        with server:
+            first = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "Hi"}]
+            )
+            time.sleep(0.01)
+            second = client.chat.completions.create(
+                model="gpt-3.5-turbo-1106",
+                messages=[{"role": "user", "content": "Hi"}]
+            )
 
+            assert first.id != second.id
+            assert first.model == "gpt-4"
+            assert second.model == "gpt-3.5-turbo-1106"
+            assert second.choices[0].message.content == "How can I assist you?"
 
+    def test_should_reply_finish_reason_only_in_last_chunk(self, client: OpenAI):
+        server = gpt_server(12306)
+        server.chat.completions.request(prompt="Hi").response(content="Hi Hi Hi", finish_reason="length")
 
+        with server:
+            stream = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "Hi"}],
+                stream=True
+            )
+
+            chunks = list(stream)
+
+            assert "".join(chunk.choices[0].delta.content for chunk in chunks) == "Hi Hi Hi"
+            assert [chunk.choices[0].finish_reason for chunk in chunks[:-1]] == [None] * (len(chunks) - 1)
+            assert chunks[-1].choices[0].finish_reason == "length"
+
+    def test_should_not_block_other_requests_while_delaying(self, client: OpenAI):
+        server = gpt_server(12306)
+        server.chat.completions.request(prompt="Hi").response(content="How can I assist you?", sleep=1)
+
+        def create(_):
+            return client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "Hi"}]
+            )
+
+        with server:
+            start = time.time()
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                responses = list(executor.map(create, range(4)))
+            stop = time.time()
+
+            assert [response.choices[0].message.content for response in responses] == ["How can I assist you?"] * 4
+            assert 1 < stop - start < 2
+
+    def test_should_reply_content_for_delay_distributions(self, client: OpenAI):
+        server = gpt_server(12306)
+        server.chat.completions.request(prompt="uniform").response(content="Uniform", sleep=uniform(0.2, 0.4))
+        server.chat.completions.request(prompt="normal").response(content="Normal", sleep=normal(0.3, 0.01))
+        server.chat.completions.request(prompt="percentiles").response(
+            content="Percentiles", sleep=percentiles(p50=0.2, p90=0.3, p99=0.4))
+
+        with server:
+            for prompt in ["uniform", "normal", "percentiles"]:
+                start = time.time()
+                client.chat.completions.create(
+                    model="gpt-4",
+                    messages=[{"role": "user", "content": prompt}]
+                )
+                stop = time.time()
+
+                assert 0.2 <= stop - start < 1
+
+    def test_should_raise_exception_for_unknown_percentile(self):
+        with pytest.raises(TypeError):
+            percentiles(median=0.2)
+
+        with pytest.raises(ValueError):
+            percentiles(p0=0.2)
+
+    def test_should_delay_first_token_and_inter_tokens_in_stream(self, client: OpenAI):
+        server = gpt_server(12306)
+        server.chat.completions.request(prompt="Hi").response(content="Hi Hi Hi Hi", first_token_delay=0.5,
+                                                              inter_token_delay=0.2)
+
+        with server:
+            start = time.time()
+            stream = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "Hi"}],
+                stream=True
+            )
+
+            arrivals = [time.time() - start for _ in stream]
+
+            assert arrivals[0] >= 0.5
+            assert arrivals[-1] - arrivals[0] >= 0.2 * (len(arrivals) - 1) - 0.05
+
+    def test_should_stream_at_specified_tokens_per_second(self, client: OpenAI):
+        server = gpt_server(12306)
+        server.chat.completions.request(prompt="Hi").response(content="Hi Hi Hi Hi Hi Hi", tokens_per_second=10)
+
+        with server:
+            stream = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "Hi"}],
+                stream=True
+            )
+
+            arrivals = [time.time() for _ in stream]
+
+            assert arrivals[-1] - arrivals[0] == pytest.approx((len(arrivals) - 1) / 10, abs=0.05)
+
+    def test_should_stream_at_tokens_per_second_of_model(self, client: OpenAI):
+        server = gpt_server(12306, tokens_per_second={"gpt-4": 20})
+        server.chat.completions.request(prompt="Hi").response(content="Hi Hi Hi Hi Hi Hi")
+
+        with server:
+            stream = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "Hi"}],
+                stream=True
+            )
+
+            arrivals = [time.time() for _ in stream]
+
+            assert arrivals[-1] - arrivals[0] == pytest.approx((len(arrivals) - 1) / 20, abs=0.05)
+
+    def test_should_stream_concurrently_at_tokens_per_second(self, client: OpenAI):
+        server = gpt_server(12306)
+        server.chat.completions.request(prompt="Hi").response(content="Hi Hi Hi Hi Hi", tokens_per_second=10)
+
+        def stream(_):
+            return "".join(chunk.choices[0].delta.content for chunk in client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "Hi"}],
+                stream=True
+            ))
+
+        with server:
+            start = time.time()
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                results = list(executor.map(stream, range(8)))
+            stop = time.time()
+
+            assert results == ["Hi Hi Hi Hi Hi"] * 8
+            assert stop - start < 2
+
+    def test_should_report_stream_once_to_monitor(self, client: OpenAI):
+        monitor = StreamMonitor()
+        server = ActualGptServer(12306, monitor=monitor)
+        server.chat.completions.request(prompt="Hi").response(content="How can I assist you?")
+
+        with server:
+            stream = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "Hi"}],
+                stream=True
+            )
+            chunks = [chunk for chunk in stream]
+
+        (start, response_id), (end, end_id, count, size, duration) = monitor.events
+        assert (start, end) == ('start', 'end')
+        assert response_id == end_id == chunks[0].id
+        assert count == len(chunks)
+        assert size > len("How can I assist you?")
+        assert duration >= 0
+
+    def test_should_report_stream_chunks_to_monitor_on_demand(self, client: OpenAI):
+        monitor = StreamMonitor(chunk_events=True)
+        server = ActualGptServer(12306, monitor=monitor)
+        server.chat.completions.request(prompt="Hi").response(content="How can I assist you?")
+
+        with server:
+            stream = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "Hi"}],
+                stream=True
+            )
+            chunks = [chunk for chunk in stream]
+
+        frames = [event[1] for event in monitor.events if event[0] == 'chunk']
+        assert len(frames) == len(chunks) == monitor.events[-1][2]
+        assert all(frame.startswith(b'data: ') for frame in frames)
+
+    def test_should_reply_latest_response_of_running_session(self, client: OpenAI):
+        server = gpt_server(12306)
+        session = server.chat.completions.request(prompt="Hi").response(content="old", system_fingerprint="fp_old")
+        messages = [{"role": "user", "content": "Hi"}]
+
+        def stream():
+            return [chunk for chunk in client.chat.completions.create(model="gpt-4", messages=messages, stream=True)]
+
+        with server:
+            before = client.chat.completions.create(model="gpt-4", messages=messages)
+            stream_before = stream()
+            session.response(content="new", system_fingerprint="fp_new")
+            after = client.chat.completions.create(model="gpt-4", messages=messages)
+            stream_after = stream()
+
+        assert before.choices[0].message.content == "old"
+        assert after.choices[0].message.content == "new"
+        assert after.system_fingerprint == "fp_new"
+        assert {chunk.system_fingerprint for chunk in stream_before} == {"fp_old"}
+        assert "".join(chunk.choices[0].delta.content for chunk in stream_after) == "new"
+        assert {chunk.system_fingerprint for chunk in stream_after} == {"fp_new"}
@@ -0,0 +1,48 @@
+import json
+import os
+import subprocess
+
+from mocogpt.cli.app import __file__ as app_file
+
+current_directory = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_bench(*options):
+    return subprocess.run(["python", app_file, "bench", *options], capture_output=True, text=True, timeout=60)
+
+
+class TestMocoGPTBenchCli:
+    def test_should_bench_streaming_chat_completions(self):
+        result = run_bench("--config", os.path.join(current_directory, "chat_completions_config.json"),
+                           "--port", "12306", "--stream", "--requests", "20", "--concurrency", "4")
+
+        assert result.returncode == 0
+        assert "Requests:    20 (0 errors)" in result.stdout
+        assert "RPS:" in result.stdout
+        assert "p99" in result.stdout
+        assert "First chunk:" in result.stdout
+
+    def test_should_bench_embeddings(self):
+        data = {"input": "Hi", "model": "text-embedding-ada-002", "encoding_format": "float",
+                "dimensions": 1536, "user": "user123456"}
+        result = run_bench("--config", os.path.join(current_directory, "embeddings_config.json"),
+                           "--endpoint", "embeddings", "--data", json.dumps(data),
+                           "--requests", "20", "--concurrency", "4", "--connections", "2")
+
+        assert result.returncode == 0
+        assert "Requests:    20 (0 errors)" in result.stdout
+        assert "First chunk:" not in result.stdout
+
+    def test_should_count_errors(self):
+        result = run_bench("--config", os.path.join(current_directory, "chat_completions_config.json"),
+                           "--prompt", "unknown", "--requests", "10")
+
+        assert result.returncode == 0
+        assert "Requests:    10 (10 errors)" in result.stdout
+        assert "Errors:      400: 10" in result.stdout
+
+    def test_should_count_connection_errors(self):
+        result = run_bench("--url", "http://localhost:12399/v1", "--requests", "5")
+
+        assert result.returncode == 0
+        assert "Errors:      ClientConnectorError: 5" in result.stdout
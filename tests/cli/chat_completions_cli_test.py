@@ -1,3 +1,4 @@
+import json
 import os
 import subprocess
 import time
@@ -13,11 +14,11 @@ from mocogpt.cli.app import __file__ as app_file
 
 class TestMocoGPTCli:
     @contextmanager
-    def run_service(self, filename, port):
+    def run_service(self, filename, port, *options):
         current_directory = os.path.dirname(os.path.abspath(__file__))
         config_file = os.path.join(current_directory, filename)
         service_process = subprocess.Popen(
-            ["python", app_file, "start", config_file, "--port", port],
+            ["python", app_file, "start", config_file, "--port", port, *options],
             stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
         )
 
@@ -66,6 +67,104 @@ class TestMocoGPTCli:
             assert response.choices[0].message.content == "How can I assist you?"
             assert stop - start > 1
 
+    def test_should_run_with_sleep_distribution_response(self, client):
+        with self.run_service("chat_completions_config.json", "12306"):
+            start = time.time()
+            stream = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "uniform sleep"}],
+                stream=True
+            )
+            result = "".join(chunk.choices[0].delta.content for chunk in stream)
+            stop = time.time()
+
+            assert result == "How can I assist you?"
+            assert stop - start > 0.7
+
+    def test_should_run_with_workers(self, client):
+        with self.run_service("chat_completions_config.json", "12306", "--workers", "2", "--backlog", "256"):
+            for _ in range(4):
+                response = client.chat.completions.create(
+                    model="gpt-4",
+                    messages=[{"role": "user", "content": "Hi"}]
+                )
+                assert response.choices[0].message.content == "How can I assist you?"
+
+        with pytest.raises(httpx.ConnectError):
+            httpx.post("http://localhost:12306/v1/chat/completions", json={})
+
+    def test_should_run_with_uvloop(self, client):
+        with self.run_service("chat_completions_config.json", "12306", "--loop", "uvloop"):
+            response = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "Hi"}]
+            )
+            assert response.choices[0].message.content == "How can I assist you?"
+
+    def test_should_expose_metrics(self, client):
+        with self.run_service("chat_completions_config.json", "12306", "--metrics"):
+            client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "Hi"}]
+            )
+            metrics = httpx.get("http://localhost:12306/metrics").text
+            assert 'mocogpt_requests_total{endpoint="chat.completions",session="0",status="200"} 1' in metrics
+
+    def test_should_log_sampled_requests_to_file(self, client, tmp_path):
+        log_file = tmp_path / "mocogpt.ndjson"
+        with self.run_service("chat_completions_config.json", "12306", "--log-file", str(log_file),
+                              "--log-sample", "2", "--log-max-payload", "20"):
+            for _ in range(4):
+                client.chat.completions.create(
+                    model="gpt-4",
+                    messages=[{"role": "user", "content": "Hi"}]
+                )
+
+        records = [json.loads(line) for line in log_file.read_text().splitlines()]
+        assert [record["event"] for record in records] == ["request", "response", "request", "response"]
+        assert records[1]["payload"].startswith('{"id": "chatcmpl-')
+        assert records[1]["payload"].endswith("more characters)")
+
+    def test_should_not_log_requests_above_info_level(self, client):
+        with self.run_service("chat_completions_config.json", "12306", "--log-level", "WARNING") as service:
+            client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "Hi"}]
+            )
+            service.terminate()
+            output, _ = service.communicate()
+
+        assert "Server started" in output
+        assert "Request:" not in output
+
+    def test_should_log_one_summary_per_stream(self, client):
+        with self.run_service("chat_completions_config.json", "12306") as service:
+            stream = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "Hi"}],
+                stream=True
+            )
+            chunks = [chunk for chunk in stream]
+            service.terminate()
+            output, _ = service.communicate()
+
+        assert output.count("Stream: ") == 1
+        assert f"'chunks': {len(chunks)}" in output
+        assert "Chunk: " not in output
+
+    def test_should_log_stream_chunks_at_debug_level(self, client):
+        with self.run_service("chat_completions_config.json", "12306", "--log-level", "DEBUG") as service:
+            stream = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "Hi"}],
+                stream=True
+            )
+            chunks = [chunk for chunk in stream]
+            service.terminate()
+            output, _ = service.communicate()
+
+        assert output.count("Chunk: data: ") == len(chunks)
+
     def test_should_run_with_error_response(self, client):
         with self.run_service("chat_completions_config.json", "12306"):
             with pytest.raises(openai.RateLimitError):
@@ -1,5 +1,7 @@
+import json
 import os
 import subprocess
+from array import array
 from contextlib import contextmanager
 
 import httpx
@@ -49,4 +51,44 @@ class TestMocoEmbeddingsCli:
                     encoding_format="float",
                     dimensions=1536,
                     user="user123456"
-                )
\ No newline at end of file
+                )
+
+    def test_should_run_with_synthetic_embeddings(self, client):
+        with self.run_service("embeddings_synthetic_config.json", "12306"):
+            response = client.embeddings.create(
+                model="text-embedding-3-small",
+                input=["Hi", "Hello", "Hi"],
+                encoding_format="float"
+            )
+
+            first, second, third = (item.embedding for item in response.data)
+            assert len(first) == 256
+            assert first == third
+            assert first != second
+
+    def test_should_run_with_ngram_embeddings(self, client):
+        with self.run_service("embeddings_synthetic_config.json", "12306"):
+            response = client.embeddings.create(
+                model="text-embedding-3-large",
+                input=["Retrieval augmented generation", "Retrieval-augmented generation"],
+                encoding_format="float"
+            )
+
+            first, second = (item.embedding for item in response.data)
+            assert len(first) == 512
+            assert sum(x * y for x, y in zip(first, second)) > 0.5
+
+    def test_should_run_with_fixture_embeddings(self, client, tmp_path):
+        (tmp_path / "vectors.f32").write_bytes(array('f', [0.1, 0.2, 0.3, 0.4]).tobytes())
+        (tmp_path / "rows.json").write_text(json.dumps({"Hi": 1}))
+        config = tmp_path / "config.json"
+        config.write_text(json.dumps({"embeddings": [{
+            "request": {"model": "text-embedding-3-small"},
+            "response": {"embeddings": {"generator": "fixture", "vectors": str(tmp_path / "vectors.f32"),
+                                        "rows": str(tmp_path / "rows.json"), "dimensions": 2}}
+        }]}))
+
+        with self.run_service(str(config), "12306"):
+            response = client.embeddings.create(model="text-embedding-3-small", input="Hi", encoding_format="float")
+
+            assert response.data[0].embedding == [0.3, 0.4]
@@ -1,6 +1,28 @@
-from openai import OpenAI
+import base64
+import json
+import math
+from array import array
 
-from mocogpt import gpt_server
+import pytest
+from openai import BadRequestError, OpenAI
+
+from mocogpt import fixture, gpt_server, ngrams, startswith, synthetic
+from mocogpt.core._fixture import load_rows
+from mocogpt.core._vector import Vector
+from mocogpt.core.embeddings import EmbeddingsRequest, EmbeddingsResponse
+
+
+def cosine(left, right):
+    return sum(x * y for x, y in zip(left, right)) / (math.hypot(*left) * math.hypot(*right))
+
+
+def write_npy(path, vectors):
+    header = f"{{'descr': '<f4', 'fortran_order': False, 'shape': ({len(vectors)}, {len(vectors[0])}), }}"
+    header = header.ljust(117) + "\n"
+    with open(path, 'wb') as f:
+        f.write(b'\x93NUMPY\x01\x00' + len(header).to_bytes(2, 'little') + header.encode('latin1'))
+        for vector in vectors:
+            f.write(array('f', vector).tobytes())
 
 
 class TestMocoGPTChat:
@@ -325,6 +347,293 @@ class TestMocoGPTChat:
 
             assert response.data[0].embedding[0] == 0.002253932
 
+    def test_should_reply_all_embeddings_as_floats(self, client: OpenAI):
+        server = gpt_server(12306)
+        server.embeddings.request(input="Hi").response(embeddings=self.embeddings)
+
+        with server:
+            response = client.embeddings.create(
+                model="text-embedding-ada-002",
+                input="Hi",
+                encoding_format="float"
+            )
+
+            assert response.data[0].embedding == self.embeddings
+
+    def test_should_reply_embeddings_in_base64(self, client: OpenAI):
+        server = gpt_server(12306)
+        server.embeddings.request(input="Hi", encoding_format="base64").response(embeddings=self.embeddings)
+
+        with server:
+            response = client.embeddings.create(
+                model="text-embedding-ada-002",
+                input="Hi",
+                encoding_format="base64"
+            )
+            embedding = array('f', base64.b64decode(response.data[0].embedding))
+
+            assert embedding == array('f', self.embeddings)
+
+    def test_should_reply_embeddings_in_base64_by_default(self, client: OpenAI):
+        server = gpt_server(12306)
+        server.embeddings.request(input="Hi").response(embeddings=self.embeddings)
+
+        with server:
+            response = client.embeddings.create(model="text-embedding-ada-002", input="Hi")
+
+            assert response.data[0].embedding == array('f', self.embeddings).tolist()
+
+    def test_should_reply_null_embedding_without_configured_vector(self, client: OpenAI):
+        server = gpt_server(12306)
+        server.embeddings.request(input="Hi").response(sleep=0.01)
+
+        with server:
+            response = client.embeddings.with_raw_response.create(
+                model="text-embedding-ada-002",
+                input="Hi",
+                encoding_format="float"
+            )
+
+        assert response.http_response.status_code == 200
+        assert response.http_response.json()["data"][0]["embedding"] is None
+
+    def test_should_reply_embeddings_for_batched_input(self, client: OpenAI):
+        server = gpt_server(12306)
+        hi = server.embeddings.request(input="Hi").response(embeddings=[0.1, 0.2])
+        hello = server.embeddings.request(input=startswith("Hello")).response(embeddings=[0.3, 0.4])
+
+        with server:
+            response = client.embeddings.create(
+                model="text-embedding-ada-002",
+                input=["Hi", "Hello world", "Hi"],
+                encoding_format="float"
+            )
+
+            assert [item.index for item in response.data] == [0, 1, 2]
+            assert [item.embedding for item in response.data] == [[0.1, 0.2], [0.3, 0.4], [0.1, 0.2]]
+
+        hi.verify(times=2)
+        hello.verify(times=1)
+        server.embeddings.requests.verify(times=1)
+
+    def test_should_reply_batched_embeddings_in_base64_by_default(self, client: OpenAI):
+        server = gpt_server(12306)
+        server.embeddings.request(input="Hi").response(embeddings=[0.1, 0.2])
+        server.embeddings.request(input="Hello").response(embeddings=[0.3, 0.4])
+
+        with server:
+            response = client.embeddings.create(model="text-embedding-ada-002", input=["Hello", "Hi"])
+
+            assert [item.embedding for item in response.data] == [array('f', [0.3, 0.4]).tolist(),
+                                                                   array('f', [0.1, 0.2]).tolist()]
+
+    def test_should_reject_batch_with_unmatched_input(self, client: OpenAI):
+        server = gpt_server(12306)
+        hi = server.embeddings.request(input="Hi").response(embeddings=[0.1, 0.2])
+
+        with server:
+            with pytest.raises(BadRequestError):
+                client.embeddings.create(
+                    model="text-embedding-ada-002",
+                    input=["Hi", "Unknown"],
+                    encoding_format="float"
+                )
+
+        hi.verify(times=0)
+
+    def test_should_reply_session_matching_whole_batched_input(self, client: OpenAI):
+        server = gpt_server(12306)
+        batch = server.embeddings.request(input=["Hi", "Hello"]).response(embeddings=[0.5])
+        hi = server.embeddings.request(input="Hi").response(embeddings=[0.1, 0.2])
+
+        with server:
+            response = client.embeddings.create(
+                model="text-embedding-ada-002",
+                input=["Hi", "Hello"],
+                encoding_format="float"
+            )
+
+        assert [item.embedding for item in response.data] == [[0.5]]
+        batch.verify(times=1)
+        hi.verify(times=0)
+
+    def test_should_reply_null_embedding_for_batched_input_without_configured_vector(self, client: OpenAI):
+        server = gpt_server(12306)
+        server.embeddings.request(input="Hi").response(sleep=0.01)
+        server.embeddings.request(input="Hello").response(embeddings=[0.1, 0.2])
+
+        with server:
+            response = client.embeddings.create(
+                model="text-embedding-ada-002",
+                input=["Hello", "Hi"],
+                encoding_format="float"
+            )
+
+        assert [item.embedding for item in response.data] == [[0.1, 0.2], None]
+
+    def test_should_reply_synthetic_embeddings(self, client: OpenAI):
+        server = gpt_server(12306)
+        server.embeddings.request(model="text-embedding-3-small").response(embeddings=synthetic(dimensions=64))
+
+        with server:
+            response = client.embeddings.create(
+                model="text-embedding-3-small",
+                input=["Hi", "Hello", "Hi"],
+                encoding_format="float"
+            )
+            again = client.embeddings.create(model="text-embedding-3-small", input="Hello", encoding_format="float")
+
+        first, second, third = (item.embedding for item in response.data)
+        assert len(first) == 64
+        assert math.isclose(math.hypot(*first), 1.0, rel_tol=1e-6)
+        assert first == third
+        assert first != second
+        assert again.data[0].embedding == second
+
+    def test_should_reply_synthetic_embeddings_for_requested_dimensions(self, client: OpenAI):
+        server = gpt_server(12306)
+        server.embeddings.request(model="text-embedding-3-small").response(embeddings=synthetic(seed=7))
+
+        with server:
+            default = client.embeddings.create(model="text-embedding-3-small", input="Hi")
+            shortened = client.embeddings.create(model="text-embedding-3-small", input="Hi", dimensions=256)
+
+        assert len(default.data[0].embedding) == 1536
+        assert len(shortened.data[0].embedding) == 256
+
+    def test_should_reject_invalid_synthetic_embeddings_request(self, client: OpenAI):
+        server = gpt_server(12306)
+        server.embeddings.request(model="text-embedding-3-small").response(embeddings=synthetic())
+
+        with server:
+            for dimensions in (-3, 0, "8", 100000):
+                with pytest.raises(BadRequestError, match="Dimensions must be an integer"):
+                    client.embeddings.create(model="text-embedding-3-small", input="Hi", dimensions=dimensions)
+            with pytest.raises(BadRequestError, match="Input must be a string or a list"):
+                client.embeddings.create(model="text-embedding-3-small", input="Hi", extra_body={"input": None})
+            with pytest.raises(BadRequestError, match="Input must be a string or a list"):
+                client.embeddings.create(model="text-embedding-3-small", input=["Hi", {"text": "Hello"}])
+
+    def test_should_derive_synthetic_embeddings_from_seed(self):
+        request = EmbeddingsRequest({}, {'model': 'text-embedding-3-small', 'input': 'Hi'})
+
+        assert synthetic(seed=1).generate(request).values == synthetic(seed=1).generate(request).values
+        assert synthetic(seed=1).generate(request).values != synthetic(seed=2).generate(request).values
+        with pytest.raises(ValueError):
+            synthetic(dimensions=0)
+
+    def test_should_reply_nearby_embeddings_for_similar_inputs(self, client: OpenAI):
+        server = gpt_server(12306)
+        server.embeddings.request(model="text-embedding-3-small").response(embeddings=ngrams(dimensions=256))
+
+        with server:
+            response = client.embeddings.create(
+                model="text-embedding-3-small",
+                input=["The quick brown fox jumps over the lazy dog",
+                       "The quick brown fox jumped over a lazy dog",
+                       "Quarterly revenue grew by twelve percent"],
+                encoding_format="float"
+            )
+
+        fox, similar, unrelated = (item.embedding for item in response.data)
+        assert len(fox) == 256
+        assert math.isclose(math.hypot(*fox), 1.0, rel_tol=1e-6)
+        assert cosine(fox, similar) > 0.7
+        assert cosine(fox, unrelated) < 0.3
+
+    def test_should_derive_ngram_embeddings_from_input(self):
+        def embed(text, generator=ngrams(dimensions=64)):
+            return generator.generate(EmbeddingsRequest({}, {'model': 'text-embedding-3-small', 'input': text})).values
+
+        assert embed("Hello") == embed("Hello")
+        assert embed("Hello") == embed("hello")
+        assert embed("Hello") != embed("Hello", ngrams(dimensions=64, seed=1))
+        assert embed("") == synthetic(dimensions=64).generate(
+            EmbeddingsRequest({}, {'model': 'text-embedding-3-small', 'input': ''})).values
+        with pytest.raises(ValueError):
+            ngrams(n=0)
+
+    def test_should_reply_embeddings_from_npy_fixture(self, client: OpenAI, tmp_path):
+        write_npy(tmp_path / "vectors.npy", [[0.1, 0.2, 0.3], [0.4, 0.5, 0.6]])
+        (tmp_path / "rows.json").write_text(json.dumps(["Hi", "Hello"]))
+        server = gpt_server(12306)
+        server.embeddings.request(model="text-embedding-3-small").response(
+            embeddings=fixture(str(tmp_path / "vectors.npy"), str(tmp_path / "rows.json")))
+
+        with server:
+            floats = client.embeddings.create(
+                model="text-embedding-3-small",
+                input=["Hello", "Hi"],
+                encoding_format="float"
+            )
+            encoded = client.embeddings.create(model="text-embedding-3-small", input="Hello")
+
+        assert [item.embedding for item in floats.data] == [[0.4, 0.5, 0.6], [0.1, 0.2, 0.3]]
+        assert encoded.data[0].embedding == array('f', [0.4, 0.5, 0.6]).tolist()
+
+    def test_should_reply_embeddings_from_raw_fixture(self, client: OpenAI, tmp_path):
+        (tmp_path / "vectors.f32").write_bytes(array('f', [0.1, 0.2, 0.3, 0.4]).tobytes())
+        (tmp_path / "rows.txt").write_text("Hi\nHello\n")
+        server = gpt_server(12306)
+        server.embeddings.request(model="text-embedding-3-small").response(
+            embeddings=fixture(str(tmp_path / "vectors.f32"), str(tmp_path / "rows.txt"), dimensions=2))
+
+        with server:
+            response = client.embeddings.create(model="text-embedding-3-small", input="Hello", encoding_format="float")
+            with pytest.raises(BadRequestError):
+                client.embeddings.create(model="text-embedding-3-small", input="Unknown", encoding_format="float")
+
+        assert response.data[0].embedding == [0.3, 0.4]
+
+    def test_should_reject_invalid_fixture(self, tmp_path):
+        (tmp_path / "vectors.f32").write_bytes(array('f', [0.1, 0.2, 0.3, 0.4]).tobytes())
+
+        with pytest.raises(ValueError, match="Dimensions are required"):
+            fixture(str(tmp_path / "vectors.f32"), {"Hi": 0})
+        with pytest.raises(ValueError, match="not a multiple"):
+            fixture(str(tmp_path / "vectors.f32"), {"Hi": 0}, dimensions=3)
+        with pytest.raises(ValueError, match="out of range"):
+            fixture(str(tmp_path / "vectors.f32"), {"Hi": 2}, dimensions=2)
+
+        (tmp_path / "rows.json").write_text(json.dumps({"Hi": "0"}))
+        with pytest.raises(ValueError, match="rows.json must be an integer"):
+            fixture(str(tmp_path / "vectors.f32"), str(tmp_path / "rows.json"), dimensions=2)
+
+    def test_should_read_fixture_rows_with_windows_line_endings(self, tmp_path):
+        (tmp_path / "rows.txt").write_bytes(b"Hi\r\nHello\r\n")
+
+        assert load_rows(str(tmp_path / "rows.txt")) == {"Hi": 0, "Hello": 1}
+
+    def test_should_splice_serialized_embeddings_into_response(self):
+        response = EmbeddingsResponse("text-embedding-ada-002")
+        response.data = [Vector(self.embeddings), Vector([0.1, -0.2])]
+
+        for encoding_format in ("float", "base64", None):
+            expected = json.dumps(response.to_embeddings(encoding_format)).encode()
+            assert response.to_json(encoding_format) == expected
+
+        response = EmbeddingsResponse("text-embedding-ada-002")
+        for encoding_format in ("float", "base64"):
+            assert response.to_json(encoding_format) == json.dumps(response.to_embeddings(encoding_format)).encode()
+
+    def test_should_share_identical_embeddings_between_sessions(self, client: OpenAI):
+        server = gpt_server(12306)
+        server.embeddings.request(input="Hi").response(embeddings=list(self.embeddings))
+        server.embeddings.request(input="Hello").response(embeddings=list(self.embeddings))
+        server.embeddings.request(input="Bye").response(embeddings=[0.1, 0.2])
+
+        with server:
+            response = client.embeddings.create(
+                model="text-embedding-ada-002",
+                input=["Hi", "Hello"],
+                encoding_format="float"
+            )
+
+        first, second, other = (session._handler._embedding for session in server.embeddings.sessions)
+        assert first is second
+        assert first is not other
+        assert response.data[0].embedding == response.data[1].embedding == self.embeddings
+
     # def test_should_raise_exception_for_unknown_models(self):
     #     server = gpt_server(12306)
     #     with pytest.raises(ValueError):
@@ -0,0 +1,78 @@
+import pytest
+from openai import BadRequestError, OpenAI
+
+from mocogpt import any_of, gpt_server
+from mocogpt.core._journal import RequestJournal
+
+
+class TestMocoGPTJournal:
+    def test_should_verify_session_requests(self, client: OpenAI):
+        server = gpt_server(12306)
+        hi = server.chat.completions.request(prompt="Hi").response(content="How can I assist you?")
+        hello = server.chat.completions.request(prompt="Hello").response(content="Hello there")
+
+        with server:
+            for _ in range(3):
+                client.chat.completions.create(model="gpt-4", messages=[{"role": "user", "content": "Hi"}])
+
+        hi.verify(times=3)
+        hi.verify(at_least=2, at_most=3)
+        hello.verify(times=0)
+        with pytest.raises(AssertionError, match="Expected 2 requests, but received 3"):
+            hi.verify(times=2)
+        with pytest.raises(AssertionError, match="Expected at least 1 requests, but received 0"):
+            hello.verify()
+
+    def test_should_record_endpoint_requests(self, client: OpenAI):
+        server = gpt_server(12306)
+        server.embeddings.request(input="Hi").response(embeddings=[0.1, 0.2])
+
+        with server:
+            client.embeddings.create(input="Hi", model="text-embedding-ada-002")
+            with pytest.raises(BadRequestError):
+                client.embeddings.create(input="Unknown", model="text-embedding-3-small")
+
+        requests = server.embeddings.requests
+        requests.verify(times=2)
+        assert [(request.input, request.model) for request in requests] == [
+            ("Hi", "text-embedding-ada-002"),
+            ("Unknown", "text-embedding-3-small"),
+        ]
+        assert server.embeddings.sessions[0].requests[0].input == "Hi"
+        server.chat.completions.requests.verify(times=0)
+
+    def test_should_keep_latest_requests_within_capacity(self, client: OpenAI):
+        server = gpt_server(12306, journal_capacity=2)
+        session = server.chat.completions.request(prompt=any_of("1", "2", "3", "4")).response(content="Number")
+
+        with server:
+            for prompt in ["1", "2", "3", "4"]:
+                client.chat.completions.create(model="gpt-4", messages=[{"role": "user", "content": prompt}])
+
+        session.verify(times=4)
+        assert [request.prompt for request in session.requests] == ["3", "4"]
+        assert session.requests.evicted == 2
+
+    def test_should_keep_first_requests_when_evicting_newest(self, client: OpenAI):
+        server = gpt_server(12306, journal_capacity=2, journal_eviction='newest')
+        server.chat.completions.request(prompt=any_of("1", "2", "3")).response(content="Number")
+
+        with server:
+            for prompt in ["1", "2", "3"]:
+                client.chat.completions.create(model="gpt-4", messages=[{"role": "user", "content": prompt}])
+
+        requests = server.chat.completions.requests
+        requests.verify(times=3)
+        assert [request.prompt for request in requests] == ["1", "2"]
+
+    def test_should_only_count_requests_without_capacity(self):
+        journal = RequestJournal(capacity=0)
+        for request in range(10000):
+            journal.record(request)
+
+        journal.verify(times=10000)
+        assert len(journal) == 0
+
+    def test_should_reject_unknown_eviction(self):
+        with pytest.raises(ValueError, match="Unknown eviction"):
+            gpt_server(12306, journal_eviction='random')
@@ -0,0 +1,107 @@
+import re
+import time
+
+import httpx
+import pytest
+from openai import BadRequestError, OpenAI, RateLimitError
+
+from mocogpt import gpt_server, rate_limit
+
+
+def sample(metrics: str, name: str) -> float:
+    matched = re.search(rf"^{re.escape(name)} (\S+)$", metrics, re.MULTILINE)
+    assert matched is not None, name
+    return float(matched.group(1))
+
+
+class TestMocoGPTMetrics:
+    def test_should_not_expose_metrics_by_default(self, client: OpenAI):
+        server = gpt_server(12306)
+        server.chat.completions.request(prompt="Hi").response(content="How can I assist you?")
+
+        with server:
+            assert httpx.get("http://localhost:12306/metrics").status_code == 404
+
+    def test_should_count_requests(self, client: OpenAI):
+        server = gpt_server(12306, expose_metrics=True)
+        server.chat.completions.request(prompt="Hi").response(content="How can I assist you?")
+        server.chat.completions.request(prompt="Hello").response(error=rate_limit("Rate limit reached", "requests"))
+
+        with server:
+            for _ in range(2):
+                client.chat.completions.create(model="gpt-4", messages=[{"role": "user", "content": "Hi"}])
+
+            with pytest.raises(RateLimitError):
+                client.with_options(max_retries=0).chat.completions.create(
+                    model="gpt-4",
+                    messages=[{"role": "user", "content": "Hello"}]
+                )
+
+            with pytest.raises(BadRequestError):
+                client.chat.completions.create(model="gpt-4", messages=[{"role": "user", "content": "Unknown"}])
+
+            response = httpx.get("http://localhost:12306/metrics")
+
+        assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        metrics = response.text
+        assert sample(metrics, 'mocogpt_requests_total{endpoint="chat.completions",session="0",status="200"}') == 2
+        assert sample(metrics, 'mocogpt_requests_total{endpoint="chat.completions",session="1",status="429"}') == 1
+        assert sample(metrics, 'mocogpt_requests_total{endpoint="chat.completions",session="none",status="400"}') == 1
+        assert sample(metrics, 'mocogpt_unmatched_requests_total{endpoint="chat.completions"}') == 1
+        assert sample(metrics, 'mocogpt_match_seconds_count{endpoint="chat.completions"}') == 4
+        assert sample(metrics, 'mocogpt_match_seconds_bucket{endpoint="chat.completions",le="+Inf"}') == 4
+        assert sample(metrics, 'mocogpt_write_seconds_count{endpoint="chat.completions"}') == 2
+        assert sample(metrics, 'mocogpt_bytes_written_total{endpoint="chat.completions"}') > 0
+
+    def test_should_measure_streams(self, client: OpenAI):
+        server = gpt_server(12306, expose_metrics=True)
+        server.chat.completions.request(prompt="Hi").response(content="How can I assist you?")
+
+        with server:
+            stream = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "Hi"}],
+                stream=True
+            )
+            content = "".join(chunk.choices[0].delta.content for chunk in stream)
+            metrics = httpx.get("http://localhost:12306/metrics").text
+
+        assert content == "How can I assist you?"
+        assert sample(metrics, 'mocogpt_streams_in_flight') == 0
+        assert sample(metrics, 'mocogpt_render_seconds_count{endpoint="chat.completions"}') == 1
+        assert sample(metrics, 'mocogpt_bytes_written_total{endpoint="chat.completions"}') > len(content)
+        assert sample(metrics, 'mocogpt_requests_total{endpoint="chat.completions",session="0",status="200"}') == 1
+
+    def test_should_count_aborted_streams_apart(self, client: OpenAI):
+        server = gpt_server(12306, expose_metrics=True)
+        server.chat.completions.request(prompt="Hi").response(content="Hi " * 50, tokens_per_second=10)
+
+        with server:
+            with httpx.stream("POST", "http://localhost:12306/v1/chat/completions", json={
+                "model": "gpt-4",
+                "messages": [{"role": "user", "content": "Hi"}],
+                "stream": True
+            }) as response:
+                next(response.iter_lines())
+
+            for _ in range(50):
+                metrics = httpx.get("http://localhost:12306/metrics").text
+                if sample(metrics, 'mocogpt_streams_in_flight') == 0:
+                    break
+                time.sleep(0.1)
+
+        assert sample(metrics, 'mocogpt_requests_total{endpoint="chat.completions",session="0",status="499"}') == 1
+        assert 'status="200"' not in metrics
+        assert 'mocogpt_bytes_written_total{endpoint="chat.completions"}' not in metrics
+
+    def test_should_dump_metrics_to_file(self, client: OpenAI, tmp_path):
+        metrics_file = tmp_path / "metrics.prom"
+        server = gpt_server(12306, metrics_file=str(metrics_file))
+        server.embeddings.request(input="Hi").response(embeddings=[0.1, 0.2, 0.3])
+
+        with server:
+            client.embeddings.create(input="Hi", model="text-embedding-ada-002")
+
+        metrics = metrics_file.read_text()
+        assert sample(metrics, 'mocogpt_requests_total{endpoint="embeddings",session="0",status="200"}') == 1
+        assert sample(metrics, 'mocogpt_render_seconds_count{endpoint="embeddings"}') == 1
@@ -0,0 +1,104 @@
+import json
+
+import pytest
+from openai import BadRequestError, OpenAI
+
+from mocogpt import gpt_server
+from mocogpt.core.actual_server import ActualGptServer, Monitor
+
+
+class TimingMonitor(Monitor):
+    def __init__(self):
+        self.timings = []
+
+    async def on_request_timing(self, timing):
+        self.timings.append(timing)
+
+
+class TestMocoGPTMonitor:
+    def test_should_time_request_phases(self, client: OpenAI):
+        monitor = TimingMonitor()
+        server = ActualGptServer(12306, monitor=monitor)
+        server.chat.completions.request(prompt="Hi").response(content="How can I assist you?")
+
+        with server:
+            client.chat.completions.create(model="gpt-4", messages=[{"role": "user", "content": "Hi"}])
+
+        [timing] = monitor.timings
+        assert (timing.endpoint, timing.session, timing.status) == ("chat.completions", "0", 200)
+        assert list(timing.durations) == ["read", "decode", "request", "match", "handler", "serialize", "write"]
+        assert sum(timing.durations.values()) <= timing.duration
+        assert timing.spans is None
+
+    def test_should_time_stream_phases(self, client: OpenAI):
+        monitor = TimingMonitor()
+        server = ActualGptServer(12306, monitor=monitor)
+        server.chat.completions.request(prompt="Hi").response(content="How can I assist you?", sleep=0.1)
+
+        with server:
+            stream = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "Hi"}],
+                stream=True
+            )
+            [chunk for chunk in stream]
+
+        [timing] = monitor.timings
+        assert timing.durations["delay"] >= 0.1
+        assert {"serialize", "write"} <= set(timing.durations)
+        assert timing.size > 0
+
+    def test_should_not_wait_between_chunks_of_unpaced_stream(self, client: OpenAI):
+        monitor = TimingMonitor()
+        server = ActualGptServer(12306, monitor=monitor)
+        server.chat.completions.request(prompt="Hi").response(content="How can I assist you?")
+
+        with server:
+            stream = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "Hi"}],
+                stream=True
+            )
+            [chunk for chunk in stream]
+
+        [timing] = monitor.timings
+        assert "delay" not in timing.durations
+
+    def test_should_time_unmatched_request(self, client: OpenAI):
+        monitor = TimingMonitor()
+        server = ActualGptServer(12306, monitor=monitor)
+        server.embeddings.request(input="Hi").response(embeddings=[0.1, 0.2])
+
+        with server:
+            with pytest.raises(BadRequestError):
+                client.with_options(max_retries=0).embeddings.create(input="Unknown", model="text-embedding-ada-002")
+
+        [timing] = monitor.timings
+        assert (timing.endpoint, timing.session, timing.status) == ("embeddings", "none", 400)
+        assert "match" in timing.durations
+        assert "handler" not in timing.durations
+
+    def test_should_write_chrome_trace(self, client: OpenAI, tmp_path):
+        trace_file = tmp_path / "trace.json"
+        server = gpt_server(12306, trace_file=str(trace_file))
+        server.chat.completions.request(prompt="Hi").response(content="How can I assist you?")
+
+        with server:
+            client.chat.completions.create(model="gpt-4", messages=[{"role": "user", "content": "Hi"}])
+            stream = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "Hi"}],
+                stream=True
+            )
+            [chunk for chunk in stream]
+
+        events = json.loads(trace_file.read_text())
+        requests = [event for event in events if event.get("cat") == "request"]
+        phases = [event for event in events if event.get("cat") == "phase"]
+
+        assert [request["name"] for request in requests] == ["chat.completions", "chat.completions"]
+        assert requests[0]["args"] == {"session": "0", "status": 200, "bytes": requests[0]["args"]["bytes"]}
+        assert {"decode", "match", "handler", "serialize", "write"} <= {phase["name"] for phase in phases}
+        for phase in phases:
+            assert any(request["tid"] == phase["tid"] and request["ts"] <= phase["ts"] and
+                       phase["ts"] + phase["dur"] <= request["ts"] + request["dur"] + 1 for request in requests)
@@ -1,7 +1,12 @@
+import asyncio
+import re
+import sys
+
 import pytest
 from openai import BadRequestError, OpenAI
 
 from mocogpt import any_of, contains, endswith, eq, gpt_server, none_of, regex, startswith
+from mocogpt.core._loop import loop_factory
 
 
 class TestMocoGPT:
@@ -13,6 +18,51 @@ class TestMocoGPT:
         with pytest.raises(TypeError):
             server.chat.completions.request(prompt="Hi").response(unknown="Hi")
 
+    def test_should_raise_exception_for_unknown_loop(self):
+        with pytest.raises(ValueError):
+            gpt_server(12306, loop="unknown")
+
+    @pytest.mark.parametrize("loop", ["asyncio", "uvloop"])
+    def test_should_stream_with_loop(self, client: OpenAI, loop):
+        server = gpt_server(12306, loop=loop)
+        server.chat.completions.request(prompt="Hi").response(content="How can I assist you?")
+
+        with server:
+            stream = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "Hi"}],
+                stream=True
+            )
+            assert "".join(chunk.choices[0].delta.content for chunk in stream) == "How can I assist you?"
+
+    def test_should_warn_when_falling_back_from_uvloop(self, monkeypatch, caplog):
+        monkeypatch.setitem(sys.modules, "uvloop", None)
+
+        loop = loop_factory("uvloop")()
+        loop.close()
+
+        assert isinstance(loop, asyncio.AbstractEventLoop)
+        assert "uvloop is not installed" in caplog.text
+
+    def test_should_run_with_loop_factory(self, client: OpenAI):
+        loops = []
+
+        def new_event_loop():
+            loops.append(asyncio.new_event_loop())
+            return loops[-1]
+
+        server = gpt_server(12306, loop=new_event_loop)
+        server.chat.completions.request(prompt="Hi").response(content="How can I assist you?")
+
+        with server:
+            response = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "Hi"}]
+            )
+            assert response.choices[0].message.content == "How can I assist you?"
+
+        assert len(loops) == 1
+
     def test_should_not_reply_anything(self, client: OpenAI):
         server = gpt_server(12306)
 
@@ -202,3 +252,157 @@ class TestMocoGPT:
             )
 
             assert response.choices[0].message.content == "How can I assist you?"
+
+    def test_should_reply_first_registered_session_for_indexed_prompt(self, client: OpenAI):
+        server = gpt_server(12306)
+        for index in range(1000):
+            server.chat.completions.request(prompt=f"Prompt {index}").response(content=f"Reply {index}")
+        server.chat.completions.request(prompt=contains("Hi")).response(content="Contains Hi")
+        server.chat.completions.request(prompt="Hi").response(content="Exact Hi")
+        server.chat.completions.request(prompt="Prompt 42").response(content="Duplicated")
+
+        with server:
+            response = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "Prompt 42"}]
+            )
+
+            assert response.choices[0].message.content == "Reply 42"
+
+            response = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "Hi"}]
+            )
+
+            assert response.choices[0].message.content == "Contains Hi"
+
+    def test_should_reply_content_for_indexed_prompt_and_model(self, client: OpenAI):
+        server = gpt_server(12306)
+        server.chat.completions.request(prompt="Hi", model="gpt-4").response(content="From gpt-4")
+        server.chat.completions.request(prompt="Hi", model="gpt-3.5-turbo-1106").response(content="From gpt-3.5")
+
+        with server:
+            response = client.chat.completions.create(
+                model="gpt-3.5-turbo-1106",
+                messages=[{"role": "user", "content": "Hi"}]
+            )
+
+            assert response.choices[0].message.content == "From gpt-3.5"
+
+            with pytest.raises(BadRequestError):
+                client.chat.completions.create(
+                    model="gpt-4o",
+                    messages=[{"role": "user", "content": "Hi"}]
+                )
+
+    def test_should_reply_content_for_combined_operators(self, client: OpenAI):
+        server = gpt_server(12306)
+        server.chat.completions.request(
+            prompt=none_of(startswith("Hi"), endswith("!"), contains("Hello")),
+            model=any_of("gpt-4", "gpt-4o"),
+            temperature=1.0
+        ).response(content="How can I assist you?")
+
+        with server:
+            response = client.chat.completions.create(
+                model="gpt-4o",
+                messages=[{"role": "user", "content": "Nice to meet you"}],
+                temperature=1.0
+            )
+
+            assert response.choices[0].message.content == "How can I assist you?"
+
+            with pytest.raises(BadRequestError):
+                client.chat.completions.create(
+                    model="gpt-4o",
+                    messages=[{"role": "user", "content": "Nice to meet you!"}],
+                    temperature=1.0
+                )
+
+    def test_should_reply_first_registered_session_for_substring_operators(self, client: OpenAI):
+        server = gpt_server(12306)
+        for index in range(100):
+            server.chat.completions.request(prompt=contains(f"<{index}>")).response(content=f"Contains {index}")
+            server.chat.completions.request(prompt=startswith(f"[{index}]")).response(content=f"Starts {index}")
+            server.chat.completions.request(prompt=endswith(f"({index})")).response(content=f"Ends {index}")
+
+        with server:
+            response = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "[7] Hi <42> there <3> (1)"}]
+            )
+
+            assert response.choices[0].message.content == "Ends 1"
+
+            response = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "[7] Hi <42> there <5>"}]
+            )
+
+            assert response.choices[0].message.content == "Contains 5"
+
+            with pytest.raises(BadRequestError):
+                client.chat.completions.create(
+                    model="gpt-4",
+                    messages=[{"role": "user", "content": "Hi <100> [1]"}]
+                )
+
+    def test_should_reply_content_for_regex_operator_with_flags_and_mode(self, client: OpenAI):
+        server = gpt_server(12306)
+        server.chat.completions.request(prompt=regex("hi", re.IGNORECASE, mode="fullmatch")).response(
+            content="Full match")
+        server.chat.completions.request(prompt=regex("you", mode="search")).response(content="Search")
+
+        with server:
+            response = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "HI"}]
+            )
+
+            assert response.choices[0].message.content == "Full match"
+
+            response = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "Hi, It's you"}]
+            )
+
+            assert response.choices[0].message.content == "Search"
+
+            with pytest.raises(BadRequestError):
+                client.chat.completions.create(
+                    model="gpt-4",
+                    messages=[{"role": "user", "content": "Hi there"}]
+                )
+
+    def test_should_raise_exception_for_unknown_regex_mode(self):
+        with pytest.raises(ValueError):
+            regex("^Hi", mode="unknown")
+
+    def test_should_reply_first_registered_session_for_combined_regex(self, client: OpenAI):
+        server = gpt_server(12306, combine_regex=True)
+        server.chat.completions.request(prompt=regex("Hi"), model="gpt-4").response(content="Hi from gpt-4")
+        for index in range(100):
+            server.chat.completions.request(prompt=regex(f"Hi {index}\\b")).response(content=f"Hi {index}")
+        server.chat.completions.request(prompt=regex("Hi")).response(content="Hi")
+
+        with server:
+            response = client.chat.completions.create(
+                model="gpt-4",
+                messages=[{"role": "user", "content": "Hi 42"}]
+            )
+
+            assert response.choices[0].message.content == "Hi from gpt-4"
+
+            response = client.chat.completions.create(
+                model="gpt-4o",
+                messages=[{"role": "user", "content": "Hi 42"}]
+            )
+
+            assert response.choices[0].message.content == "Hi 42"
+
+            response = client.chat.completions.create(
+                model="gpt-4o",
+                messages=[{"role": "user", "content": "Hi 420"}]
+            )
+
+            assert response.choices[0].message.content == "Hi"